@@ -1,17 +1,20 @@
 # Standard library imports
+from time import perf_counter
+process_start = perf_counter()
+
 import asyncio
-from datetime import time, timedelta, datetime
+from datetime import time, datetime
 import math
 import sys
+from functools import partial
 from os import execv
 import subprocess
-import importlib
+import importlib.util
 
 def verify_libraries_installed(libraries):
     for library in libraries:
-        try:
-            importlib.import_module(library[0])
-        except ImportError:
+        # find_spec locates the package without importing it
+        if importlib.util.find_spec(library[0]) is None:
             print(f"{library[0]} not installed. Installing...")
             subprocess.call([sys.executable, "-m", "pip", "install", library[1]])
 
@@ -19,9 +22,7 @@ libraries = [
     ("discord", "discord.py"),
     ("rich", "rich"),
     ("matplotlib", "matplotlib"),
-    ("pandas", "pandas"),
     ("pytz", "pytz"),
-    ("requests", "requests"),
     ("yaml", "PyYAML"),
     ("numpy", "numpy")
 ]
@@ -31,7 +32,7 @@ verify_libraries_installed(libraries)
 # Third-party imports
 import discord
 from discord.ext import commands, tasks
-from io import StringIO
+from io import BytesIO, StringIO
 # from rich import print
 from rich.table import Table
 from rich.live import Live
@@ -41,16 +42,64 @@ import re
 
 
 # Local imports
+import bulk_move
 import cmds
 import config
+import daily_reports
+import dispatcher
+import game_rooms
+import guild_index
+import io_pool
+import journal
+import log_channels
+import metrics
+import perf
+import prometheus
+import rollups
+import scheduler
 import util
+import version_check
+import voice_sessions
 
 install()
+startup_timings = {}  # Startup phase -> seconds since process start
+
+
+def mark_startup_phase(phase):
+    if phase not in startup_timings:
+        startup_timings[phase] = perf_counter() - process_start
+
+
+def print_startup_report():
+    print("Startup timings:")
+    previous = 0.0
+    for phase, elapsed in startup_timings.items():
+        print(f"\t{phase:<20}{elapsed:7.2f}s (+{elapsed - previous:.2f}s)")
+        previous = elapsed
+
+
+mark_startup_phase('import')
 heartbeat_counter = 0
-user_join_times = {}
-initial_run_sha = 0
+initial_run_sha = None
 max_auto_channels = 9
-daily_voice_minutes = {}
+voice_flush_interval = getattr(config, 'VOICE_FLUSH_INTERVAL', 60)  # Seconds between voice data flushes
+game_room_debounce = getattr(config, 'GAME_ROOM_DEBOUNCE', 1.0)  # Seconds to batch joins before updating game rooms
+heatmap_days = getattr(config, 'HEATMAP_DAYS', 28)  # Days covered by the heatmap in the daily report
+
+version_checker = version_check.VersionChecker()
+voice_engine = voice_sessions.SessionEngine()
+room_allocators = game_rooms.RoomAllocators(max_auto_channels, game_room_debounce)
+guild_metrics = metrics.MetricsTracker(voice_engine)
+metrics_runner = None
+report_delivery = None  # Staggered daily report deliveries, kept referenced while they run
+task_scheduler = scheduler.Scheduler(load_state=util.load_schedule_async, save_state=util.save_schedule_async)
+
+prometheus.Gauge('tle_gateway_latency_seconds', 'Discord gateway heartbeat latency.',
+                 lambda: bot.latency if math.isfinite(bot.latency) else None)
+prometheus.Gauge('tle_outbound_queue_depth', 'Log messages waiting to be sent.',
+                 lambda: dispatcher.outbound.queue_depth())
+prometheus.Gauge('tle_storage_io_in_flight', 'Storage calls queued or running in the I/O pool.',
+                 lambda: io_pool.io_stats['in_flight'])
 
 tle_prefix = '!'
 
@@ -61,17 +110,45 @@ bot.add_command(cmds.move)
 bot.add_command(cmds.set_log_channel)
 bot.add_command(cmds.toggle_logging)
 bot.add_command(cmds.allowed_roles)
+bot.add_command(cmds.report_delay)
+bot.add_command(cmds.stats)
+bot.add_command(cmds.heatmap)
 bot_start_time = datetime.now()
-bot_start_time_formatted = util.get_current_time(False, True)
 
 # Initialize the bot
 
 
+@bot.event
+async def setup_hook():
+    # Called once the bot has logged in, before connecting to the gateway
+    global metrics_runner
+    mark_startup_phase('login')
+    perf.instrument_bot(bot, loops=(flush_voice_data, check_version))
+    prometheus.instrument_http(bot)
+    if metrics_runner is None:
+        metrics_runner = await prometheus.start_server()
+
+
 @bot.event
 async def on_ready():
-    global initial_run_sha, daily_voice_minutes
-    initial_run_sha = util.get_latest_commit_sha()
-    daily_voice_minutes = util.load_daily_voice_minutes()
+    global initial_run_sha
+    first_ready = 'on_ready' not in startup_timings
+    mark_startup_phase('on_ready')
+    if initial_run_sha is None:
+        initial_run_sha = await version_checker.get_latest_sha()
+    if first_ready:
+        # Resume today's voice time and the sessions that were open before the restart
+        for guild_id, minutes in (await util.load_daily_voice_minutes_async()).items():
+            voice_engine.set_voice_seconds(guild_id, minutes * 60)
+        checkpoint = await util.load_voice_sessions_async()
+    else:
+        # Reconnected: reconcile with whoever joined or left while disconnected
+        checkpoint = voice_engine.checkpoint()
+    voice_engine.restore(checkpoint, voice_sessions.live_voice_states(bot.guilds))
+    for guild in bot.guilds:
+        # Events may have been missed while down; start the journal from who is in voice now
+        journal.voice_journal.record_boot(guild.id, [(user_id, channel_id, counted) for _, user_id, channel_id, counted
+                                                     in voice_sessions.live_voice_states([guild])])
 
     print("----------------------")
     print("Logged in at: %s" % util.get_current_time())
@@ -83,11 +160,18 @@ async def on_ready():
 
     print("Bot is running on the following servers:")
     for guild in bot.guilds:
+        # Cached state may have changed while disconnected
+        guild_index.rebuild(guild)
+        # Allocators hold channel objects from before a re-IDENTIFY; rebuild them lazily
+        room_allocators.drop_guild(guild)
         print(f"\tServer: {guild.name} (ID: {guild.id})")
-        print(f"\t\tLoaded daily voice: {daily_voice_minutes.get(guild.id, 0)} minutes")
+        print(f"\t\tLoaded daily voice: {voice_engine.voice_minutes(guild.id)} minutes")
 
     print("----------------------")
-    util.populate_userlist(bot)
+    await util.preload_voice_activity_async([guild.id for guild in bot.guilds])
+    await util.populate_userlist_async(bot)
+    await rebuild_guild_metrics()
+    mark_startup_phase('populate_userlist')
 
     print('Voice activity data updated.')
 
@@ -95,12 +179,16 @@ async def on_ready():
     for command in sorted(bot.commands, key=lambda cmd: cmd.name):
         print(f"\t!{command.name}")
 
+    if first_ready:
+        print_startup_report()
+
     print("\nInitializing and scheduling tasks...")
 
-    daily_report.start()
-    check_and_move_users.start()
-    check_version.start()
-    restart_bot_loop.start()
+    task_scheduler.start()
+    if not check_version.is_running():
+        check_version.start()
+    if not flush_voice_data.is_running():
+        flush_voice_data.start()
     #heartbeat_loop.start()
     
     # message_content = f'{bot.user} is now online and connected to the following servers:\n'
@@ -117,6 +205,8 @@ async def on_ready():
 
 @bot.event
 async def on_guild_join(guild):
+    guild_index.rebuild(guild)
+    guild_metrics.rebuild(guild)
     current_time = util.get_current_time()
     print(f"[{current_time}] [{guild.name}] The bot has been added to the server: {guild.name} (id: {guild.id}) with {guild.member_count} members.")
 
@@ -132,6 +222,11 @@ async def on_guild_join(guild):
 
 @bot.event
 async def on_guild_remove(guild):
+    guild_index.drop(guild)
+    guild_metrics.drop(guild)
+    rollups.rollup_engine.drop(guild.id)
+    room_allocators.drop_guild(guild)
+    log_channels.invalidate(guild.id)
     current_time = util.get_current_time()
     print(f"[{current_time}] [{guild.name}] The bot has been removed from the server: {guild.name} (id: {guild.id}) with {guild.member_count} members.")
 
@@ -145,6 +240,15 @@ async def on_guild_remove(guild):
     await util.send_developer_message(bot, title, description, color)
 
 
+async def close_bot():
+    """Send queued log messages, then close the bot."""
+    try:
+        await asyncio.wait_for(dispatcher.outbound.drain(), timeout=10)
+    except asyncio.TimeoutError:
+        print(f"Closing with {dispatcher.outbound.queue_depth()} log messages unsent")
+    await bot.close()
+
+
 @bot.command()
 async def exit(ctx):
     if ctx.author.id == config.DEVELOPER_ID:
@@ -152,7 +256,7 @@ async def exit(ctx):
         description = 'Bot is exiting. Restart will be attempted...'
         color = discord.Color.red()
         await util.send_developer_message(bot, title, description, color)
-        await bot.close()
+        await close_bot()
 
 # Loop section
 
@@ -162,6 +266,12 @@ async def exit(ctx):
 #     # heartbeat_proc()
 #     await live_heartbeat()
 
+async def rebuild_guild_metrics():
+    # Full scan; only needed on ready and when the daily counters reset
+    for guild in bot.guilds:
+        guild_metrics.rebuild(guild, await util.manage_voice_activity_async(guild.id))
+
+
 def generate_table() -> Table:
     table = Table()
     table.add_column("Uptime", justify="center")
@@ -178,11 +288,7 @@ def generate_table() -> Table:
     # current_time = util.get_current_time()
 
     for guild in bot.guilds:
-        total_users = len(guild.members)
-        users_in_voice_chat = sum(
-            1 for member in guild.members if member.voice)
-        unique_users_in_voice_chat = util.manage_voice_activity(
-            guild.id, 0, add_user=False)
+        total_users, users_in_voice_chat, unique_users_today, voice_minutes_today = guild_metrics.snapshot(guild.id)
 
         # Truncate the guild name to 17 characters
         truncated_guild_name = guild.name[:20]
@@ -196,28 +302,16 @@ def generate_table() -> Table:
             latency_text = f"[{latency_color}]{latency_ms:.1f}ms[/{latency_color}]"
         else:
             latency_text = f"[{latency_color}]{latency_ms:.2f}ms[/{latency_color}]"
-        if unique_users_in_voice_chat is not None:
-            table.add_row(
-                uptime_str,
-                # current_time,
-                latency_text,
-                f"{truncated_guild_name}",
-                str(total_users),
-                str(users_in_voice_chat),
-                str(len(unique_users_in_voice_chat)),
-                f"{str(daily_voice_minutes.get(guild.id, 0))} minutes"
-            )
-        else:
-            table.add_row(
-                uptime_str,
-                # current_time,
-                latency_text,
-                f"{truncated_guild_name}",
-                str(total_users),
-                str(users_in_voice_chat),
-                "0",
-                f"{str(daily_voice_minutes.get(guild.id, 0))} minutes"
-            )
+        table.add_row(
+            uptime_str,
+            # current_time,
+            latency_text,
+            f"{truncated_guild_name}",
+            str(total_users),
+            str(users_in_voice_chat),
+            str(unique_users_today),
+            f"{voice_minutes_today} minutes"
+        )
 
     return table
 
@@ -233,6 +327,36 @@ async def heartbeat(ctx):
         #await ctx.send('Running heartbeat...')
         table = generate_table()
         await send_table_as_code_block(ctx, table)
+        stats = util.config_cache_stats
+        await ctx.send(f"Config cache: {stats['hits']} hits / {stats['misses']} misses")
+        outbound_stats = dispatcher.outbound.stats
+        latency = dispatcher.outbound.latency_stats()
+        await ctx.send(
+            f"Outbound queue: {dispatcher.outbound.queue_depth()} waiting, "
+            f"{outbound_stats['sent_events']} events in {outbound_stats['sent_messages']} messages "
+            f"({outbound_stats['coalesced_events']} coalesced, {outbound_stats['retried']} retried, {outbound_stats['failed']} failed), "
+            f"send latency p50 {latency['p50']:.2f}s / p99 {latency['p99']:.2f}s")
+
+@bot.command(name='perf')
+async def show_perf(ctx):
+    if ctx.author.id == config.DEVELOPER_ID:
+        table = Table()
+        table.add_column("Handler")
+        table.add_column("Calls", justify="right")
+        table.add_column("p50", justify="right")
+        table.add_column("p99", justify="right")
+        table.add_column("Max", justify="right")
+        table.add_column("Total", justify="right")
+        for name, reservoir in perf.top(12):
+            table.add_row(
+                name[:32],
+                str(reservoir.count) if not reservoir.errors else f"{reservoir.count} ({reservoir.errors}!)",
+                f"{reservoir.percentile(0.5) * 1000:.1f}ms",
+                f"{reservoir.percentile(0.99) * 1000:.1f}ms",
+                f"{reservoir.max * 1000:.0f}ms",
+                f"{reservoir.total:.1f}s"
+            )
+        await send_table_as_code_block(ctx, table)
 
 def strip_control_characters(s):
     return re.sub(r'\x1b[^m]*m', '', s)
@@ -250,207 +374,178 @@ async def send_table_as_code_block(ctx, table):
     # Send the stripped contents as a code block in a message
     await ctx.send(f"```\n{stripped_contents}\n```")
 
-@tasks.loop(hours=24)
 async def check_and_move_users():
     for guild in bot.guilds:
-        source_channel = discord.utils.get(
-            guild.voice_channels, name="Twerk")
-        
+        source_channel = util.get_channel_by_name(guild, "Twerk", discord.VoiceChannel)
+
         if source_channel is None:
-            source_channel = discord.utils.get(
-                guild.voice_channels, name="Work")
+            source_channel = util.get_channel_by_name(guild, "Work", discord.VoiceChannel)
 
-        member_general_channel = discord.utils.get(
-            guild.voice_channels, name="Member General")
+        member_general_channel = util.get_channel_by_name(guild, "Member General", discord.VoiceChannel)
 
         if source_channel and member_general_channel:
-            moved_users_count = 0
-            for member in source_channel.members:
-                try:
-                    await member.move_to(member_general_channel)
-                    moved_users_count += 1
-                except discord.errors.HTTPException as e:
-                    print(f'Error moving {member.display_name}: {str(e)}')
+            results = await bulk_move.move_members(source_channel.members, member_general_channel)
+            moved_users_count = sum(1 for result in results if result.status == bulk_move.MOVED)
+            for result in results:
+                if result.status == bulk_move.FAILED:
+                    print(f'Error moving {result.member.display_name}: {result.reason}')
             current_time = util.get_current_time()
 
             if moved_users_count > 0:
-                print(f"[{current_time}] [AutoMove] Moved {util.pluralize(moved_users_count, 'user', 'users')} from {source_channel.name} to {member_general_channel.name}")
+                print(f"[{current_time}] [AutoMove] Moved {moved_users_count} {util.pluralize(moved_users_count, 'user', 'users')} from {source_channel.name} to {member_general_channel.name}")
             else:
                 print(
                     f"[{current_time}] [AutoMove] No users to move from {source_channel.name} to {member_general_channel.name}")
 
 
-@tasks.loop(hours=24)
 async def daily_report():
-    global daily_voice_minutes
+    global report_delivery
     print("Generating daily report...")
-    config = util.load_config('262726474967023619') # Hardcoding for TLE
+    # Close out today's voice time, including sessions that are still open
+    voice_seconds = voice_engine.roll_day()
+    await util.flush_voice_data_async()
     current_time = util.get_current_time(False)
-    # Create the message embed
-    title = f"{current_time} Daily Report for {util.pluralize(len(bot.guilds), 'Guild', 'All Guilds')}"
-    description = "Plot displays the number of unique users who joined a voice channel since the prior day by guild."
-    color = discord.Color.magenta()
 
-    # Update the voice activity data
+    # Snapshot every guild's day before anything is reset, then start the new day
+    guild_configs = {}
     for guild in bot.guilds:
-        userlist = util.manage_voice_activity(guild.id, 0, add_user=False)
+        guild_configs[guild.id] = await util.load_config_async(guild.id)
+        # Sessions with no events today still need to show up in today's journal segment
+        journal.voice_journal.record_present(guild.id, [(user_id, channel_id, counted) for _, user_id, channel_id, counted
+                                                        in voice_sessions.live_voice_states([guild])])
+        userlist = await util.manage_voice_activity_async(guild.id, 0, add_user=False)
         if userlist is None:
             unique_users = 0
         else:
             unique_users = len(userlist)
 
         # Get the total voice minutes for the guild
-        total_voice_minutes = daily_voice_minutes.get(guild.id, 0)
+        total_voice_minutes = int(voice_seconds.get(guild.id, 0) // 60)
 
         # Save the daily report data to a file
-        util.save_daily_report(guild.id, current_time, unique_users, total_voice_minutes)
-        #if (guild.id == 262726474967023619) and config.get('logging_enabled', True) == True: # Hardcoding for TLE
-        if config.get('logging_enabled', True) == True: # Hardcoding for TLE
-            log_channel_name = config['log_channel_name']
-            log_channel = discord.utils.get(
-                guild.text_channels, name=log_channel_name)
-
-            if not log_channel:
-                overwrites = {
-                    guild.default_role: discord.PermissionOverwrite(
-                        read_messages=False)
-                }
-                log_channel = await guild.create_text_channel(log_channel_name, overwrites=overwrites)
-
-            # Find or create the "Daily Reports" thread under the log_channel
-            daily_reports_thread = discord.utils.get(
-                log_channel.threads, name="Daily Reports")
-
-            if not daily_reports_thread:
-                daily_reports_thread = await log_channel.create_thread(name="Daily Reports", type=discord.ChannelType.public_thread, auto_archive_duration=10080)
-
-            plot_image_file = util.generate_plot(bot.guilds)
-            with open(plot_image_file, 'rb') as file:
-                await util.send_embed(daily_reports_thread, title, description, color, None, None, file=discord.File(file))
-
-    if not config.get('logging_enabled', True) or len(bot.guilds) > 1:
-        # Generate the plot and get the image file path
-        plot_image_file = util.generate_plot(bot.guilds)
-
-        # Send the embed with the image to the developer
-        with open(plot_image_file, 'rb') as file:
-            await util.send_developer_message(bot, title, description, color, file=discord.File(file))
-        
+        await util.save_daily_report_async(guild.id, current_time, unique_users, total_voice_minutes)
+
     # Reset daily voice minutes
-    daily_voice_minutes = {}
-    util.clear_daily_voice_minutes()
+    await util.clear_daily_voice_minutes_async()
+    await util.save_voice_sessions_async(voice_engine.checkpoint())
+
+    for guild in bot.guilds:
+        await util.clear_voice_activity_async(guild.id)
+
+    await util.populate_userlist_async(bot)
+    await rebuild_guild_metrics()
 
+    # Each guild renders and uploads its own report in its own slot of the stagger window
+    jobs = []
     for guild in bot.guilds:
-        util.clear_voice_activity(guild.id)
+        guild_config = guild_configs[guild.id]
+        if guild_config.get('logging_enabled', True):
+            offset = guild_config.get('daily_report_delay', daily_reports.stagger_offset(guild.id))
+            jobs.append((guild.name, offset, partial(send_guild_report, guild, guild_config, current_time)))
+
+    if len(bot.guilds) > 1 or len(jobs) < len(bot.guilds):
+        # The developer gets every guild in one plot, including those with logging disabled
+        jobs.append(('developer', 0, partial(send_developer_report, list(bot.guilds), current_time)))
+
+    # Deliver in the background so the scheduler records this run as soon as the day is reset;
+    # a restart during the stagger window then drops the remaining reports instead of resetting the day twice
+    report_delivery = asyncio.create_task(deliver_daily_reports(jobs, [guild.id for guild in bot.guilds]))
+
+
+async def deliver_daily_reports(jobs, guild_ids):
+    await daily_reports.run_staggered(jobs)
+
+    # Fold journal segments past the retention window into session summaries
+    try:
+        await util.run_io(journal.voice_journal.compact_all, guild_ids)
+    except Exception as exc:
+        print(f'[Daily Report] Journal compaction failed: {type(exc).__name__}: {exc}')
+
+
+async def send_guild_report(guild, guild_config, current_time):
+    title = f"{current_time} Daily Report for {guild.name}"
+    description = "Plot displays the number of unique users who joined a voice channel since the prior day."
+    color = discord.Color.magenta()
+
+    # Find or create the "Daily Reports" thread under the log_channel
+    daily_reports_thread = await log_channels.get_daily_reports_thread(guild, guild_config['log_channel_name'])
+
+    plot_png = await util.generate_plot_async([guild])
+    plot_file = discord.File(BytesIO(plot_png), filename='daily_report_plot.png')
+    await util.send_embed(daily_reports_thread, title, description, color, None, None, file=plot_file)
+
+    if guild_config.get('daily_heatmap', False):
+        heatmap_png = await util.generate_heatmap_async(guild, heatmap_days)
+        heatmap_file = discord.File(BytesIO(heatmap_png), filename='voice_heatmap.png')
+        await util.send_embed(daily_reports_thread, f'{guild.name} Voice Activity by Hour',
+                              f'Average number of members in voice over the last {heatmap_days} days.', color, file=heatmap_file)
+
+
+async def send_developer_report(guilds, current_time):
+    title = f"{current_time} Daily Report for {util.pluralize(len(guilds), 'Guild', 'All Guilds')}"
+    description = "Plot displays the number of unique users who joined a voice channel since the prior day by guild."
 
-    util.populate_userlist(bot)
+    # Send the embed with the image to the developer
+    plot_png = await util.generate_plot_async(guilds)
+    plot_file = discord.File(BytesIO(plot_png), filename='daily_report_plot.png')
+    await util.send_developer_message(bot, title, description, discord.Color.magenta(), file=plot_file)
+
+@tasks.loop(seconds=voice_flush_interval)
+async def flush_voice_data():
+    writes = await util.flush_voice_data_async()
+    await util.save_voice_sessions_async(voice_engine.checkpoint())
+    await util.run_io(journal.voice_journal.flush)
+    if writes > 0:
+        print(f"[{util.get_current_time()}] [Storage] Flushed {writes} {util.pluralize(writes, 'voice data file', 'voice data files')}")
 
 @tasks.loop(seconds=30)
 async def check_version():
     global initial_run_sha
-    check_sha = util.get_latest_commit_sha()
+    check_sha = await version_checker.get_latest_sha()
+
+    if check_sha is None:
+        return
+    if initial_run_sha is None:
+        # The check at startup failed; treat the first successful one as the running version
+        initial_run_sha = check_sha
+        return
 
-    if not check_sha.startswith('Error') and initial_run_sha != check_sha:
+    if initial_run_sha != check_sha:
         title = "New bot version has been detected."
         description = f'Initiating the update and restart process...\n[{initial_run_sha}] -> [{check_sha}]'
         color = discord.Color.blurple()
         await util.send_developer_message(bot, title, description, color)
-        await bot.close()
+        await close_bot()
 
-@tasks.loop(hours=24)
-async def restart_bot_loop():
-    now = datetime.now()
-    weekday = now.weekday()  # Monday is 0 and Sunday is 6
+async def restart_bot():
+    print("Restarting bot...")
+    await close_bot()
 
-    # Schedule the bot to restart at 0400 on Tuesday (weekday 1)
-    if weekday == 1:
-        print("Restarting bot...")
-        await bot.close()
+# Schedule section
 
-# Before loop section
 
-
-def get_initial_delay(target_time: time = None, interval: timedelta = None) -> float:
-    now = util.get_current_time(False, True)
-
-    if target_time:
-        # Schedule task at the target time
-        if now.time() >= target_time:
-            tomorrow = now.date() + timedelta(days=1)
-        else:
-            tomorrow = now.date()
-        next_run = datetime.combine(
-            tomorrow, target_time, tzinfo=now.tzinfo)
-    elif interval:
-        # Schedule task at the next interval
-        interval_seconds = interval.total_seconds()
-        elapsed_time = (now - now.replace(hour=0, minute=0,
-                        second=0, microsecond=0)).total_seconds()
-        next_run_seconds = math.ceil(
-            elapsed_time / interval_seconds) * interval_seconds
-        next_run = now.replace(hour=0, minute=0, second=0,
-                               microsecond=0) + timedelta(seconds=next_run_seconds)
-
-    return (next_run - now).total_seconds()
-
-
-# @heartbeat_loop.before_loop
-# async def before_heartbeat_loop():
-#     heartbeat_proc()
-#     initial_delay = get_initial_delay(interval=timedelta(minutes=30))
-#     #print('Heartbeat loop scheduled for: {}'.format(initial_delay))
-#     await asyncio.sleep(initial_delay)
-
-
-@check_and_move_users.before_loop
-async def before_check_and_move_users():
-    target_time = time(hour=18, minute=00)
-    initial_delay = get_initial_delay(target_time=target_time)
-    print('First Check/Move scheduled for: \t{}'.format(target_time))
-    await asyncio.sleep(initial_delay)
-
-
-@daily_report.before_loop
-async def before_daily_report():
-    target_time = time(hour=6, minute=00)
-    initial_delay = get_initial_delay(target_time=target_time)
-    print('Daily Report loop scheduled for:\t{}'.format(target_time))
-    await asyncio.sleep(initial_delay)
-
-@check_version.before_loop
-async def before_check_version():
-    initial_delay = get_initial_delay(interval=timedelta(seconds=30))
-    print('Version Check loop scheduled for: {}'.format(initial_delay))
-    await asyncio.sleep(initial_delay)
-
-@restart_bot_loop.before_loop
-async def before_restart_bot():
-    target_time = time(hour=4, minute=1)
-    initial_delay = get_initial_delay(target_time=target_time)
-    print('Restart bot loop scheduled for: {}'.format(initial_delay))
-    await asyncio.sleep(initial_delay)
+# Times are in SERVER_TIMEZONE. A run missed while the bot was down is made up
+# on startup unless it is more than `grace` seconds late.
+task_scheduler.register('daily_report', time(hour=6, minute=0), perf.instrument('task:daily_report')(daily_report))
+task_scheduler.register('check_and_move_users', time(hour=18, minute=0), perf.instrument('task:check_and_move_users')(check_and_move_users),
+                        grace=30 * 60)
+# Restart at 0401 on Tuesdays (weekday 1); never make up a missed restart
+task_scheduler.register('restart_bot', time(hour=4, minute=1), perf.instrument('task:restart_bot')(restart_bot), weekdays=[1], grace=0)
 
 
 # Event section
 
 
 async def log_event(guild, log_channel_name, title, description, color, timestamp=None):
-    config = util.load_config(guild.id)
+    config = await util.load_config_async(guild.id)
     if not config.get('logging_enabled', True):
         return
 
-    log_channel = discord.utils.get(guild.text_channels, name=log_channel_name)
-
-    if not log_channel:
-        overwrites = {
-            guild.default_role: discord.PermissionOverwrite(
-                read_messages=False)
-        }
-        log_channel = await guild.create_text_channel(log_channel_name, overwrites=overwrites)
+    log_channel = await log_channels.get_log_channel(guild, log_channel_name)
 
     embed = discord.Embed(title=title, description=description,
                           color=color, timestamp=timestamp)
-    await log_channel.send(embed=embed)
+    dispatcher.outbound.enqueue(log_channel, embed)
 
 
 @bot.event
@@ -470,99 +565,139 @@ async def on_command_error(ctx, error):
         await ctx.send(f'Error: {error}')
 
 
+@bot.event
+async def on_member_join(member):
+    guild_index.add_member(member)
+    guild_metrics.member_joined(member.guild.id)
+
+
 @bot.event
 async def on_member_remove(member):
-    await log_event(member.guild, config['log_channel_name'], f'{member.display_name} left the server', '', discord.Color.red(), timestamp=datetime.datetime.now())
+    guild_index.remove_member(member)
+    guild_metrics.member_left(member.guild.id)
+    guild_config = await util.load_config_async(member.guild.id)
+    await log_event(member.guild, guild_config['log_channel_name'], f'{member.display_name} left the server', '', discord.Color.red(), timestamp=datetime.now())
 
 
 @bot.event
 async def on_member_update(before, after):
+    if before.name != after.name:
+        guild_index.add_member(after)
     if before.nick != after.nick:
-        await log_event(after.guild, config['log_channel_name'], f'{after.display_name} changed their nickname', f'Before: {before.nick}\nAfter: {after.nick}', discord.Color.blue())
+        guild_config = await util.load_config_async(after.guild.id)
+        await log_event(after.guild, guild_config['log_channel_name'], f'{after.display_name} changed their nickname', f'Before: {before.nick}\nAfter: {after.nick}', discord.Color.blue())
+
+@bot.event
+async def on_user_update(before, after):
+    # Usernames are global, so every guild the user shares with the bot is affected
+    if before.name != after.name:
+        for guild in after.mutual_guilds:
+            member = util.get_member_by_id(guild, after.id)
+            if member is not None:
+                guild_index.add_member(member)
+
+
+@bot.event
+async def on_guild_channel_create(channel):
+    guild_index.add_channel(channel)
+    room_allocators.channel_created(channel)
+
+
+@bot.event
+async def on_guild_channel_delete(channel):
+    guild_index.remove_channel(channel)
+    log_channels.channel_deleted(channel)
+    room_allocators.channel_deleted(channel)
+
+
+@bot.event
+async def on_guild_channel_update(before, after):
+    guild_index.add_channel(after)
+    log_channels.channel_updated(before, after)
+    room_allocators.channel_updated(before, after)
+
+
+@bot.event
+async def on_thread_delete(thread):
+    log_channels.channel_deleted(thread)
+
+
+@bot.event
+async def on_thread_update(before, after):
+    log_channels.channel_updated(before, after)
+
+
+@bot.event
+async def on_guild_role_create(role):
+    guild_index.add_role(role)
+
+
+@bot.event
+async def on_guild_role_delete(role):
+    guild_index.remove_role(role)
+
+
+@bot.event
+async def on_guild_role_update(before, after):
+    guild_index.add_role(after)
+
 
 @bot.event
 async def on_voice_state_update(member, before, after):
-    global daily_voice_minutes
     # Handle Game Room voice channel creation / deletion
-    categories_to_monitor = ["Member Game Rooms", "Public Game Rooms"]
-
     if before.channel != after.channel:
-        for category_name in categories_to_monitor:
-            game_room_category = discord.utils.get(member.guild.categories, name=category_name)
-
-            if game_room_category:
-                # Check if the user has joined or left a channel in the specified category
-                if (before.channel and before.channel.category == game_room_category) or (after.channel and after.channel.category == game_room_category):
-                    # Retrieve and sort the game rooms in the category
-                    game_rooms = sorted([channel for channel in member.guild.voice_channels if util.is_game_room_channel(channel, category_name)],
-                                        key=lambda x: int(x.name.split()[-1]))
-
-                    # Delete empty game rooms except Game Room 1
-                    for i, game_room in enumerate(game_rooms):
-                        if i != 0 and len(game_room.members) == 0:
-                            await game_room.delete()
-
-                    # Refresh the list of game rooms
-                    game_rooms = sorted([channel for channel in member.guild.voice_channels if util.is_game_room_channel(channel, category_name)],
-                                        key=lambda x: int(x.name.split()[-1]))
-
-                    # Determine the next available integer for Game Room
-                    next_game_room_number = None
-                    for i, game_room in enumerate(game_rooms):
-                        game_room_number = i + 1
-
-                        if game_room_number != int(game_room.name.split()[-1]):
-                            next_game_room_number = game_room_number
-                            break
-
-                    # Assign the next available integer if not found
-                    if next_game_room_number is None:
-                        next_game_room_number = int(game_rooms[-1].name.split()[-1]) + 1
-
-                    # Create the next Game Room if needed
-                    if len(game_rooms[-1].members) > 0 and len(game_rooms[0].members) > 0 and len(game_rooms) < max_auto_channels:
-                        await util.create_game_room(member.guild, game_room_category, f"{next_game_room_number}")
+        room_allocators.voice_channel_changed(before.channel)
+        room_allocators.voice_channel_changed(after.channel)
 
     # ====================================================================================================
 
     # Store the user ID in joined_users set when they join a voice channel
     if before.channel is None and after.channel is not None:
-        util.manage_voice_activity(member.guild.id, member.id, add_user=True)
+        await util.manage_voice_activity_async(member.guild.id, member.id, add_user=True)
+        guild_metrics.voice_joined(member.guild.id, member.id)
+    elif before.channel is not None and after.channel is None:
+        guild_metrics.voice_left(member.guild.id)
+
+    # Account voice time for the member's session in this guild
+    duration = None
+    if before.channel != after.channel:
+        guild_id = member.guild.id
+        if before.channel is None:
+            voice_engine.join(guild_id, member.id, after.channel.id, voice_sessions.is_counted(after.channel))
+        elif after.channel is None:
+            duration = voice_engine.leave(guild_id, member.id)
+        else:
+            duration = voice_engine.switch(guild_id, member.id, after.channel.id, voice_sessions.is_counted(after.channel))
+        journal.voice_journal.record(guild_id, member.id, before.channel, after.channel, voice_sessions.is_counted)
+
+        if before.channel is not None and voice_sessions.is_counted(before.channel):
+            util.save_daily_voice_minutes(guild_id, voice_engine.voice_minutes(guild_id))
+            action = 'left' if after.channel is None else 'switched'
+            print(f'User {member.display_name} {action} voice channel. Current usage for the day is : \t {voice_engine.voice_minutes(guild_id)}')
 
     # Track channel join/leave
     if before.channel != after.channel:
-        config = util.load_config(member.guild.id)
+        config = await util.load_config_async(member.guild.id)
         
         # Check if logging is enabled
         if not config.get('logging_enabled', True):
             return
 
-        log_channel_name = config['log_channel_name']
-        log_channel = discord.utils.get(
-            member.guild.text_channels, name=log_channel_name)
-
         # Create the log channel if it doesn't exist
-        if not log_channel:
-            overwrites = {
-                member.guild.default_role: discord.PermissionOverwrite(
-                    read_messages=False)
-            }
-            log_channel = await member.guild.create_text_channel(log_channel_name, overwrites=overwrites)
-
-        user_id = member.id
+        log_channel = await log_channels.get_log_channel(member.guild, config['log_channel_name'])
+
         avatar_url = str(member.avatar.url) if member.avatar else str(member.default_avatar.url)
-        now = util.get_current_time(False, True)
+        formatted_duration = util.format_duration(round(duration)) if duration is not None else 'Unknown'
 
         # If the user joined a voice channel
         if before.channel is None:
-            user_join_times[user_id] = now
             title = ""
             if member.discriminator and member.discriminator != "0":
                 title = f'{member.display_name}#{member.discriminator} connected to a voice channel'
             else:
                 title = f'{member.display_name} connected to a voice channel'
 
-            last_seen = util.load_last_seen(member.guild.id, member.id)
+            last_seen = await util.load_last_seen_async(member.guild.id, member.id)
             if last_seen != 'Never':
                 time_difference = util.compute_time_difference(last_seen)
             description = f'> {member.mention} joined `{after.channel.category}.{after.channel.name}`'
@@ -577,26 +712,9 @@ async def on_voice_state_update(member, before, after):
                     (f'Last Seen on Server', f'{last_seen}'),
                     (f'Users in {after.channel.name}', util.user_list(after.channel))
                 ]
-            await util.send_embed(log_channel, title, description, color, None, fields, None, thumbnail_url=avatar_url)
+            util.queue_embed(log_channel, title, description, color, None, fields, thumbnail_url=avatar_url)
         # If the user left a voice channel
         elif after.channel is None:
-            duration = round(
-                (now - user_join_times.pop(user_id, now)).total_seconds())
-                
-            # Check if duration is 0
-            if duration == 0:
-                duration = round((now - bot_start_time_formatted).total_seconds())
-
-            formatted_duration = util.format_duration(duration)
-
-            # Update daily voice minutes
-            if before.channel.name != 'Away from Keyboard':
-                if member.guild.id not in daily_voice_minutes:
-                    daily_voice_minutes[member.guild.id] = 0
-                daily_voice_minutes[member.guild.id] = daily_voice_minutes.get(member.guild.id, 0) + (duration // 60)
-                util.save_daily_voice_minutes(member.guild.id, daily_voice_minutes[member.guild.id])
-                print(f'User {member.display_name} left voice channel. Current usage for the day is : \t {daily_voice_minutes[member.guild.id]}')
-
             title = ""
             if member.discriminator and member.discriminator != "0":
                 title = f'{member.display_name}#{member.discriminator} disconnected from a voice channel'
@@ -611,27 +729,9 @@ async def on_voice_state_update(member, before, after):
                 (f'Users in {before.channel.name}',
                 util.user_list(before.channel))
             ]
-            await util.send_embed(log_channel, title, description, color, None, fields, None, thumbnail_url=avatar_url)
+            util.queue_embed(log_channel, title, description, color, None, fields, thumbnail_url=avatar_url)
         # If the user switched voice channels
         else:
-            duration = round(
-                (now - user_join_times.pop(user_id, now)).total_seconds())
-
-            # Check if duration is 0
-            if duration == 0:
-                duration = round((now - bot_start_time_formatted).total_seconds())
-
-            formatted_duration = util.format_duration(duration)
-
-            # Update daily voice minutes
-            if before.channel.name != 'Away from Keyboard':
-                if member.guild.id not in daily_voice_minutes:
-                    daily_voice_minutes[member.guild.id] = 0
-                daily_voice_minutes[member.guild.id] = daily_voice_minutes.get(member.guild.id, 0) + (duration // 60)
-                util.save_daily_voice_minutes(member.guild.id, daily_voice_minutes[member.guild.id])
-                print(f'User {member.display_name} switched voice channel. Current usage for the day is : \t {daily_voice_minutes[member.guild.id]}')
-
-            user_join_times[user_id] = now
             title = ""
             if member.discriminator and member.discriminator != "0":
                 title = f'{member.display_name}#{member.discriminator} switched voice channels'
@@ -648,12 +748,13 @@ async def on_voice_state_update(member, before, after):
                 (f'Users in {after.channel.name}',
                 util.user_list(after.channel))
             ]
-            await util.send_embed(log_channel, title, description, color, None, fields, None, thumbnail_url=avatar_url)
-        util.store_last_seen(member.guild.id, member.id)
+            util.queue_embed(log_channel, title, description, color, None, fields, thumbnail_url=avatar_url)
+        await util.store_last_seen_async(member.guild.id, member.id)
 
 
 
 async def run_bot():
+    global metrics_runner
     while True:
         try:
             await bot.start(config.DISCORD_TOKEN)  # Replace TOKEN with your bot token
@@ -677,6 +778,15 @@ async def run_bot():
             print(f"An unexpected error occurred: {exc}")
             await bot.close()
             break
+        finally:
+            # Never lose buffered voice data on shutdown or restart
+            await util.flush_voice_data_async()
+            await util.save_voice_sessions_async(voice_engine.checkpoint())
+            await util.run_io(journal.voice_journal.flush)
+            await version_checker.close()
+            if metrics_runner is not None:
+                await metrics_runner.cleanup()
+                metrics_runner = None
             
 
 if __name__ == "__main__":
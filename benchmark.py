@@ -0,0 +1,381 @@
+"""Replay synthetic voice traffic through the bot's handlers without Discord.
+
+Builds fake guilds, channels and members, then drives on_voice_state_update,
+log_event and the !move command with a randomized (or scripted) event stream.
+Discord sends are stubbed; storage runs for real in a temporary directory so
+disk operations are counted. Examples:
+
+    python benchmark.py --guilds 3 --members 500 --events 5000
+    python benchmark.py --rate 200 --backend yaml
+    python benchmark.py --script events.jsonl
+
+A script is one JSON object per line:
+    {"guild": 0, "member": 12, "channel": "General"}      join or switch
+    {"guild": 0, "member": 12, "channel": null}           leave
+    {"guild": 0, "log": "Nickname changed"}               log_event
+    {"guild": 0, "move": ["Member General", "Gaming"]}    !move destination source
+"""
+
+# Standard library imports
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+import types
+from collections import Counter
+
+# Third-party library imports
+import discord
+
+VOICE_LAYOUT = {
+    'Voice': ['General', 'Gaming', 'Member General', 'Away from Keyboard'],
+    'Member Game Rooms': ['Game Room 1'],
+    'Public Game Rooms': ['Game Room 1'],
+}
+
+
+def install_config(args):
+    """Provide the settings normally read from the user's config.py."""
+    config = types.ModuleType('config')
+    config.DISCORD_TOKEN = 'benchmark'
+    config.DEVELOPER_ID = 0
+    config.SERVER_TIMEZONE = 'UTC'
+    config.GITHUB_TOKEN = None
+    config.STORAGE_BACKEND = args.backend
+    config.OUTBOUND_RATE = args.send_rate
+    config.GAME_ROOM_DEBOUNCE = 0.05
+    config.PERF_SLOW_THRESHOLD = float('inf')
+    sys.modules['config'] = config
+
+
+class CountingStorage:
+    """Delegates to a storage backend and counts the calls made to it."""
+
+    def __init__(self, backend):
+        self._backend = backend
+        self.calls = Counter()
+
+    def __getattr__(self, name):
+        attribute = getattr(self._backend, name)
+        if not callable(attribute):
+            return attribute
+
+        def counted(*args, **kwargs):
+            self.calls[name] += 1
+            return attribute(*args, **kwargs)
+        return counted
+
+
+class FakeCategory:
+    def __init__(self, guild, id, name):
+        self.guild = guild
+        self.id = id
+        self.name = name
+        self.channels = []
+
+    def __str__(self):
+        return self.name
+
+    @property
+    def voice_channels(self):
+        return [channel for channel in self.channels if isinstance(channel, discord.VoiceChannel)]
+
+
+class FakeVoiceChannel(discord.VoiceChannel):
+    def __init__(self, guild, id, name, category):
+        self.guild = guild
+        self.id = id
+        self.name = name
+        self.fake_category = category
+        self.category_id = category.id if category else None
+        self.fake_members = []
+
+    @property
+    def members(self):
+        return self.fake_members
+
+    @property
+    def category(self):
+        return self.fake_category
+
+    async def delete(self):
+        self.guild.remove_channel(self)
+
+
+class FakeTextChannel(discord.TextChannel):
+    def __init__(self, guild, id, name):
+        self.guild = guild
+        self.id = id
+        self.name = name
+        self.category_id = None
+        self.fake_threads = []
+
+    @property
+    def threads(self):
+        return self.fake_threads
+
+    async def send(self, content=None, embed=None, embeds=None, file=None):
+        self.guild.world.sends += 1
+        return None
+
+
+class FakeRole:
+    def __init__(self, id, name, administrator):
+        self.id = id
+        self.name = name
+        self.permissions = types.SimpleNamespace(administrator=administrator)
+
+
+class FakeMember:
+    def __init__(self, guild, id):
+        self.guild = guild
+        self.id = id
+        self.name = f'user{id}'
+        self.display_name = f'User {id}'
+        self.nick = None
+        self.discriminator = '0'
+        self.mention = f'<@{id}>'
+        self.avatar = None
+        self.default_avatar = types.SimpleNamespace(url='https://cdn.discordapp.com/embed/avatars/0.png')
+        self.roles = [guild.default_role]
+        self.voice = None
+
+    async def move_to(self, channel):
+        await asyncio.sleep(0)
+        # The move's voice state update arrives later as its own event
+        world = self.guild.world
+        world.tasks.append(asyncio.create_task(world.voice_event(self, channel)))
+
+
+class FakeGuild:
+    def __init__(self, world, id, members):
+        self.world = world
+        self.id = id
+        self.name = f'Guild {id}'
+        self.default_role = FakeRole(id, '@everyone', administrator=False)
+        self.roles = [self.default_role, FakeRole(world.next_id(), 'Admin', administrator=True)]
+        self.channels = []
+        self.categories = {}
+        for category_name, channel_names in VOICE_LAYOUT.items():
+            category = self.categories[category_name] = FakeCategory(self, world.next_id(), category_name)
+            for channel_name in channel_names:
+                self.add_channel(FakeVoiceChannel(self, world.next_id(), channel_name, category))
+        self.members = [FakeMember(self, world.next_id()) for _ in range(members)]
+        self.member_count = len(self.members)
+
+    @property
+    def voice_channels(self):
+        return [channel for channel in self.channels if isinstance(channel, discord.VoiceChannel)]
+
+    @property
+    def text_channels(self):
+        return [channel for channel in self.channels if isinstance(channel, discord.TextChannel)]
+
+    def add_channel(self, channel):
+        self.channels.append(channel)
+        if getattr(channel, 'fake_category', None):
+            channel.fake_category.channels.append(channel)
+        self.world.channels_created += 1
+
+    def remove_channel(self, channel):
+        self.channels.remove(channel)
+        if getattr(channel, 'fake_category', None):
+            channel.fake_category.channels.remove(channel)
+        self.world.channels_deleted += 1
+
+    async def create_text_channel(self, name, overwrites=None):
+        channel = FakeTextChannel(self, self.world.next_id(), name)
+        self.add_channel(channel)
+        return channel
+
+    async def create_voice_channel(self, name, category=None):
+        channel = FakeVoiceChannel(self, self.world.next_id(), name, category)
+        self.add_channel(channel)
+        return channel
+
+
+class World:
+    """The fake Discord state plus the counters the report is built from."""
+
+    def __init__(self, bot_module, guilds, members, seed):
+        self.bot = bot_module
+        self.random = random.Random(seed)
+        self._id = 1000
+        self.sends = 0
+        self.channels_created = 0
+        self.channels_deleted = 0
+        self.tasks = []
+        self.guilds = [FakeGuild(self, index, members) for index in range(guilds)]
+
+    def next_id(self):
+        self._id += 1
+        return self._id
+
+    def voice_event(self, member, channel):
+        """Apply a voice state change and dispatch it the way discord.py does."""
+        before = types.SimpleNamespace(channel=member.voice.channel if member.voice else None)
+        if before.channel is not None:
+            before.channel.fake_members.remove(member)
+        if channel is not None:
+            channel.fake_members.append(member)
+        member.voice = types.SimpleNamespace(channel=channel) if channel is not None else None
+        after = types.SimpleNamespace(channel=channel)
+        return self.bot.on_voice_state_update(member, before, after)
+
+    def random_events(self, count, log_every, move_every):
+        for index in range(1, count + 1):
+            guild = self.random.choice(self.guilds)
+            if move_every and index % move_every == 0:
+                yield {'guild': guild.id, 'move': ['Member General', 'Gaming']}
+            elif log_every and index % log_every == 0:
+                yield {'guild': guild.id, 'log': 'Nickname changed'}
+            else:
+                member = self.random.randrange(len(guild.members))
+                in_voice = guild.members[member].voice is not None
+                if in_voice and self.random.random() < 0.3:
+                    channel = None
+                else:
+                    channel = self.random.choice(guild.voice_channels).name
+                yield {'guild': guild.id, 'member': member, 'channel': channel}
+
+    def handle(self, event):
+        """Return the coroutine that runs one event, and its kind for the report."""
+        guild = self.guilds[event['guild']]
+        if 'move' in event:
+            destination, source = event['move']
+            return 'command:move', self.bot.cmds.move.callback(FakeContext(guild), destination, source)
+        if 'log' in event:
+            return 'log_event', self.bot.log_event(guild, 'server_logs', event['log'], '', discord.Color.blue())
+
+        member = guild.members[event['member']]
+        channel = None
+        if event['channel'] is not None:
+            channel = discord.utils.get(guild.voice_channels, name=event['channel'])
+        return 'on_voice_state_update', self.voice_event(member, channel)
+
+
+class FakeContext:
+    def __init__(self, guild):
+        self.guild = guild
+        self.author = FakeMember(guild, 1)
+        self.author.roles = guild.roles
+        self.replies = []
+
+    async def send(self, content=None, **kwargs):
+        self.replies.append(content)
+
+
+async def run(args):
+    import perf
+    import storage
+    import TLEDiscord
+    import dispatcher
+    import guild_index
+    import io_pool
+    import journal
+    import util
+
+    backend = storage.YamlStorage() if args.backend == 'yaml' else storage.SQLiteStorage()
+    counting = storage._storage = CountingStorage(backend)
+    dispatcher.outbound = dispatcher.OutboundDispatcher(args.send_rate, dispatcher.OUTBOUND_BURST, dispatcher.OUTBOUND_COALESCE_AFTER)
+
+    world = World(TLEDiscord, args.guilds, args.members, args.seed)
+    for guild in world.guilds:
+        guild_index.rebuild(guild)
+        TLEDiscord.guild_metrics.rebuild(guild)
+        util.save_config(guild.id, {'log_channel_name': 'server_logs', 'logging_enabled': not args.no_logging})
+    counting.calls.clear()
+
+    if args.script:
+        with open(args.script) as file:
+            events = [json.loads(line) for line in file if line.strip()]
+    else:
+        events = list(world.random_events(args.events, args.log_every, args.move_every))
+
+    latencies = {}
+
+    async def timed(kind, coro):
+        start = time.perf_counter()
+        await coro
+        latencies.setdefault(kind, perf.Reservoir(len(events))).add(time.perf_counter() - start)
+
+    output = sys.stdout if args.verbose else open(os.devnull, 'w')
+    with contextlib.redirect_stdout(output):
+        start = time.perf_counter()
+        pending = []
+        for index, event in enumerate(events):
+            kind, coro = world.handle(event)
+            if args.rate:
+                # Events arrive on a schedule and run concurrently, like gateway dispatch
+                delay = start + index / args.rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                pending.append(asyncio.create_task(timed(kind, coro)))
+            else:
+                await timed(kind, coro)
+        await asyncio.gather(*pending)
+        await asyncio.gather(*world.tasks)
+        handled = time.perf_counter() - start
+
+        await dispatcher.outbound.drain()
+        await asyncio.sleep(TLEDiscord.room_allocators.debounce * 2)
+        await util.flush_voice_data_async()
+        await io_pool.run_io(journal.voice_journal.flush)
+        total = time.perf_counter() - start
+
+    report(args, events, handled, total, latencies, counting, world, dispatcher.outbound, io_pool.io_stats)
+    backend.close()
+
+
+def report(args, events, handled, total, latencies, counting, world, outbound, io_stats):
+    print(f'Guilds: {args.guilds}  Members per guild: {args.members}  Events: {len(events)}  '
+          f'Backend: {args.backend}  Rate: {args.rate or "unbounded"}')
+    print(f'Handled in {handled:.2f}s ({len(events) / handled:,.0f} events/s), {total:.2f}s including drain and flush')
+    print()
+    print(f'{"Handler":<24}{"Calls":>8}{"p50":>10}{"p99":>10}{"Max":>10}')
+    for kind, reservoir in sorted(latencies.items()):
+        print(f'{kind:<24}{reservoir.count:>8}{reservoir.percentile(0.5) * 1000:>8.2f}ms'
+              f'{reservoir.percentile(0.99) * 1000:>8.2f}ms{reservoir.max * 1000:>8.2f}ms')
+    print()
+    print(f'Storage operations: {sum(counting.calls.values())} '
+          f'({sum(counting.calls.values()) / len(events):.2f} per event), '
+          f'{io_stats["calls"]} through the I/O pool')
+    for name, calls in counting.calls.most_common(8):
+        print(f'\t{name:<28}{calls:>8}')
+    print(f'Discord sends: {world.sends} messages for {outbound.stats["sent_events"]} log events '
+          f'({outbound.stats["coalesced_events"]} coalesced, {outbound.stats["failed"]} failed)')
+    print(f'Channels created: {world.channels_created - sum(len(channels) for channels in VOICE_LAYOUT.values()) * args.guilds}  '
+          f'deleted: {world.channels_deleted}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--guilds', type=int, default=3)
+    parser.add_argument('--members', type=int, default=200, help='members per guild')
+    parser.add_argument('--events', type=int, default=5000)
+    parser.add_argument('--rate', type=float, default=0, help='events per second; 0 runs them back to back')
+    parser.add_argument('--log-every', type=int, default=10, help='every Nth event is a log_event call (0 disables)')
+    parser.add_argument('--move-every', type=int, default=1000, help='every Nth event is a !move (0 disables)')
+    parser.add_argument('--send-rate', type=float, default=1000.0, help='stubbed sends per second per channel')
+    parser.add_argument('--no-logging', action='store_true', help='run with voice logging disabled')
+    parser.add_argument('--backend', choices=('sqlite', 'yaml'), default='sqlite')
+    parser.add_argument('--script', help='JSON lines event script instead of random events')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--data-dir', help='where storage files are written (default: a temporary directory)')
+    parser.add_argument('--verbose', action='store_true', help="show the bot's own output")
+    args = parser.parse_args()
+
+    install_config(args)
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as temp_dir:
+        os.chdir(args.data_dir or temp_dir)
+        asyncio.run(run(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# Standard library imports
+import asyncio
+
+# Third-party library imports
+import discord
+
+# Local imports
+import config
+import dispatcher
+import util
+
+MOVE_CONCURRENCY = getattr(config, 'MOVE_CONCURRENCY', 5)  # Members moved at the same time
+MOVE_RETRIES = getattr(config, 'MOVE_RETRIES', 3)  # Extra attempts after a transient error
+
+MOVED = 'moved'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+class MoveResult:
+    __slots__ = ('member', 'status', 'reason', 'attempts')
+
+    def __init__(self, member, status, reason=None, attempts=0):
+        self.member = member
+        self.status = status
+        self.reason = reason
+        self.attempts = attempts
+
+
+async def _move(member, destination, semaphore, retries, base_delay):
+    async with semaphore:
+        for attempt in range(1, retries + 2):
+            # Members can leave voice or be moved by someone else while waiting
+            if member.voice is None or member.voice.channel is None:
+                return MoveResult(member, SKIPPED, 'left voice', attempt - 1)
+            if member.voice.channel.id == destination.id:
+                return MoveResult(member, SKIPPED, 'already there', attempt - 1)
+            try:
+                await member.move_to(destination)
+                return MoveResult(member, MOVED, attempts=attempt)
+            except (discord.HTTPException, OSError, asyncio.TimeoutError) as exc:
+                if attempt > retries or not dispatcher.is_transient(exc):
+                    return MoveResult(member, FAILED, str(exc) or type(exc).__name__, attempt)
+                await asyncio.sleep(base_delay * 2 ** (attempt - 1))
+
+
+async def move_members(members, destination, concurrency=None, retries=None, base_delay=0.5):
+    """Move members to the destination voice channel, a few at a time.
+
+    Transient errors (5xx, unpredicted 429s, network errors) are retried with
+    exponential backoff. Returns one MoveResult per member, in input order.
+    """
+    members = list(members)  # The source channel's member list shrinks as moves land
+    semaphore = asyncio.Semaphore(concurrency or MOVE_CONCURRENCY)
+    retries = MOVE_RETRIES if retries is None else retries
+    return await asyncio.gather(*(_move(member, destination, semaphore, retries, base_delay) for member in members))
+
+
+def summarize(results, source, destination, limit=1900):
+    """One line with the moved count, followed by the members that could not be moved."""
+    moved = sum(1 for result in results if result.status == MOVED)
+    summary = f'Moved {moved} {util.pluralize(moved, "user", "users")} from {source.name} to {destination.name}'
+
+    problems = [f'{result.member.display_name}: {result.reason}' for result in results if result.status == FAILED]
+    if problems:
+        summary += f'\nCould not move {len(problems)}:'
+        for index, problem in enumerate(problems):
+            if len(summary) + len(problem) + 3 > limit:
+                summary += f'\n...and {len(problems) - index} more'
+                break
+            summary += f'\n- {problem}'
+    return summary
@@ -1,17 +1,22 @@
 import discord
 from discord.ext import commands
+from io import BytesIO
 from os import path
+import bulk_move
+import daily_reports
+import log_channels
 import util
 from yaml import safe_load
 
-def has_required_role(member):
+async def has_required_role(member):
     if member.guild is None:
         return False
     # Check if the member has the "Administrator" permission
     if any(role.permissions.administrator for role in member.roles):
         return True
 
-    allowed_roles = util.load_config(member.guild.id).get('allowed_roles', [])
+    config = await util.load_config_async(member.guild.id)
+    allowed_roles = config.get('allowed_roles', [])
     # Check if the member has any of the allowed roles
     return any(role.name in allowed_roles for role in member.roles)
 
@@ -49,14 +54,13 @@ async def move(ctx, destination_name: str = None, source_name: str = None):
         return
 
     # Make sure the user has the required role
-    if not has_required_role(ctx.author):
+    if not await has_required_role(ctx.author):
         await ctx.send("You do not have the required role to use this command.")
         return
 
     # Set source voice channel
     if source_name:
-        source_channel = discord.utils.get(
-            ctx.guild.voice_channels, name=source_name)
+        source_channel = util.get_channel_by_name(ctx.guild, source_name, discord.VoiceChannel)
         if not source_channel:
             await ctx.send(f'Error: could not find source voice channel "{source_name}"')
             return
@@ -71,23 +75,16 @@ async def move(ctx, destination_name: str = None, source_name: str = None):
         return
 
     # Get destination voice channel
-    destination_channel = discord.utils.get(
-        ctx.guild.voice_channels, name=destination_name)
+    destination_channel = util.get_channel_by_name(ctx.guild, destination_name, discord.VoiceChannel)
     if not destination_channel:
         await ctx.send(f'Error: could not find destination voice channel "{destination_name}"')
         return
 
-    moved_users_count = len(source_channel.members)
-
     # Move all users in source channel to destination channel
-    for member in source_channel.members:
-        try:
-            await member.move_to(destination_channel)
-        except discord.errors.HTTPException as e:
-            await ctx.send(f'Error moving {member.display_name}: {str(e)}')
+    results = await bulk_move.move_members(source_channel.members, destination_channel)
 
     # Send confirmation message
-    await ctx.send(f'Moved {util.pluralize(moved_users_count, "user", "users")} from {source_channel.name} to {destination_channel.name}')
+    await ctx.send(bulk_move.summarize(results, source_channel, destination_channel))
 
 
 @commands.command(
@@ -96,7 +93,7 @@ async def move(ctx, destination_name: str = None, source_name: str = None):
 )
 async def set_log_channel(ctx, log_channel_name: str = None):
     # Make sure the user has the required role
-    if not has_required_role(ctx.author):
+    if not await has_required_role(ctx.author):
         await ctx.send("You do not have the required role to use this command.")
         return
 
@@ -104,9 +101,10 @@ async def set_log_channel(ctx, log_channel_name: str = None):
         await ctx.send("Please provide a log channel name.")
         return
 
-    config = util.load_config(ctx.guild.id)
+    config = await util.load_config_async(ctx.guild.id)
     config['log_channel_name'] = log_channel_name
-    util.save_config(ctx.guild.id, config)
+    await util.save_config_async(ctx.guild.id, config)
+    log_channels.invalidate(ctx.guild.id)
 
     await ctx.send(f'Successfully set the log channel name to "{log_channel_name}".')
 
@@ -114,15 +112,15 @@ async def set_log_channel(ctx, log_channel_name: str = None):
 @commands.command(name='toggle_logging')
 async def toggle_logging(ctx):
     # Make sure the user has the required role
-    if not has_required_role(ctx.author):
+    if not await has_required_role(ctx.author):
         await ctx.send("You do not have the required role to use this command.")
         return
 
     guild_id = ctx.guild.id
-    config = util.load_config(guild_id)
+    config = await util.load_config_async(guild_id)
     logging_enabled = config.get('logging_enabled', True)
     config['logging_enabled'] = not logging_enabled
-    util.save_config(guild_id, config)
+    await util.save_config_async(guild_id, config)
 
     if logging_enabled:
         await ctx.send("Logging has been disabled.")
@@ -133,11 +131,11 @@ async def toggle_logging(ctx):
 @commands.command(name='allowed_roles')
 async def allowed_roles(ctx, action: str = "show", role_name: str = None):
     # Check if they have an allowed role
-    if not has_required_role(ctx.author):
+    if not await has_required_role(ctx.author):
         await ctx.send("You do not have the required role to use this command.")
         return
     
-    config = util.load_config(ctx.guild.id)
+    config = await util.load_config_async(ctx.guild.id)
     allowed_roles = config.get('allowed_roles', [])
 
     if action.lower() == "show" or role_name is None:
@@ -162,4 +160,169 @@ async def allowed_roles(ctx, action: str = "show", role_name: str = None):
 
     # Save the updated allowed_roles list to the config
     config['allowed_roles'] = allowed_roles
-    util.save_config(ctx.guild.id, config)
\ No newline at end of file
+    await util.save_config_async(ctx.guild.id, config)
+
+MAX_REPORT_DELAY_MINUTES = 120
+
+
+@commands.command(
+    name='report_delay',
+    help='Set how many minutes after the daily report time this server\'s report is posted. \nUsage: \n   !report_delay - Show the current delay \n   !report_delay <minutes> - Set the delay \n   !report_delay auto - Use the automatically assigned slot'
+)
+async def report_delay(ctx, minutes: str = None):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    # Make sure the user has the required role
+    if not await has_required_role(ctx.author):
+        await ctx.send("You do not have the required role to use this command.")
+        return
+
+    config = await util.load_config_async(ctx.guild.id)
+    if minutes is None:
+        delay = config.get('daily_report_delay', daily_reports.stagger_offset(ctx.guild.id))
+        await ctx.send(f'The daily report is posted {delay / 60:.1f} minutes after the report time.')
+        return
+
+    if minutes.lower() == 'auto':
+        config.pop('daily_report_delay', None)
+        await util.save_config_async(ctx.guild.id, config)
+        await ctx.send('The daily report will use the automatically assigned slot.')
+        return
+
+    try:
+        delay = float(minutes)
+    except ValueError:
+        await ctx.send('Please provide the delay in minutes, or "auto".')
+        return
+    if not 0 <= delay <= MAX_REPORT_DELAY_MINUTES:
+        await ctx.send(f'The delay must be between 0 and {MAX_REPORT_DELAY_MINUTES} minutes.')
+        return
+
+    config['daily_report_delay'] = delay * 60
+    await util.save_config_async(ctx.guild.id, config)
+    await ctx.send(f'The daily report will be posted {delay:g} minutes after the report time.')
+
+
+MAX_STATS_DAYS = 3650
+STATS_ROWS = 10
+
+
+def _stats_lines(totals, describe):
+    lines = [f'{index}. {describe(key)}: {util.format_duration(round(seconds))}'
+             for index, (key, seconds) in enumerate(totals[:STATS_ROWS], start=1)]
+    return '\n'.join(lines) if lines else 'No voice activity recorded.'
+
+
+def _member_name(ctx, user_id):
+    member = util.get_member_by_id(ctx.guild, user_id)
+    return member.display_name if member else f'User {user_id}'
+
+
+def _channel_name(ctx, channel_id):
+    channel = util.get_channel_by_id(ctx.guild, channel_id)
+    return channel.name if channel else f'Deleted channel {channel_id}'
+
+
+@commands.group(
+    name='stats',
+    invoke_without_command=True,
+    help='Show voice usage from the voice journal. \nUsage: \n   !stats (days) - Top users and channels \n   !stats user (member) (days) - Time per channel for a member \n   !stats channel <channel> (days) - Top users of a voice channel'
+)
+async def stats(ctx, days: int = 30):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    days = max(1, min(days, MAX_STATS_DAYS))
+
+    from rollups import rollup_engine
+    users = await util.run_io(rollup_engine.by_day, ctx.guild.id, days, 'user')
+    channels = await util.run_io(rollup_engine.by_day, ctx.guild.id, days, 'channel')
+    fields = [
+        ('Top users', _stats_lines(users, lambda user_id: _member_name(ctx, user_id))),
+        ('Top channels', _stats_lines(channels, lambda channel_id: _channel_name(ctx, channel_id))),
+    ]
+    await util.send_embed(ctx, f'Voice usage in the last {days} {util.pluralize(days, "day", "days")}', '', discord.Color.blurple(), fields=fields)
+
+
+@stats.command(name='user', help='Time per voice channel for a member (default: yourself) over the last (days) days.')
+async def stats_user(ctx, member: discord.Member = None, days: int = 30):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    member = member or ctx.author
+    if member != ctx.author and not await has_required_role(ctx.author):
+        await ctx.send("You do not have the required role to view other members' stats.")
+        return
+    days = max(1, min(days, MAX_STATS_DAYS))
+
+    from rollups import rollup_engine
+    channels = await util.run_io(rollup_engine.by_day, ctx.guild.id, days, 'channel', user_id=member.id)
+    last_day = await util.run_io(rollup_engine.by_hour, ctx.guild.id, 24, 'user', user_id=member.id)
+    total = sum(seconds for _, seconds in channels)
+    description = (f'Total: {util.format_duration(round(total))}\n'
+                   f'Last 24 hours: {util.format_duration(round(last_day[0][1] if last_day else 0))}')
+    fields = [('Channels', _stats_lines(channels, lambda channel_id: _channel_name(ctx, channel_id)))]
+    await util.send_embed(ctx, f'{member.display_name} - last {days} {util.pluralize(days, "day", "days")}', description,
+                          discord.Color.blurple(), fields=fields, thumbnail_url=str(member.display_avatar.url))
+
+
+@stats.command(name='channel', help='Top users of a voice channel over the last (days) days.')
+async def stats_channel(ctx, channel_name: str = None, days: int = 30):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    if channel_name is None:
+        await ctx.send('Please provide a voice channel name.')
+        return
+    channel = util.get_channel_by_name(ctx.guild, channel_name, discord.VoiceChannel, case_insensitive=True)
+    if channel is None:
+        await ctx.send(f'Error: could not find voice channel "{channel_name}"')
+        return
+    days = max(1, min(days, MAX_STATS_DAYS))
+
+    from rollups import rollup_engine
+    users = await util.run_io(rollup_engine.by_day, ctx.guild.id, days, 'user', channel_id=channel.id)
+    total = sum(seconds for _, seconds in users)
+    fields = [('Top users', _stats_lines(users, lambda user_id: _member_name(ctx, user_id)))]
+    await util.send_embed(ctx, f'{channel.name} - last {days} {util.pluralize(days, "day", "days")}',
+                          f'Total: {util.format_duration(round(total))} from {len(users)} {util.pluralize(len(users), "user", "users")}',
+                          discord.Color.blurple(), fields=fields)
+
+
+@commands.group(
+    name='heatmap',
+    invoke_without_command=True,
+    help='Show average voice users by weekday and hour. \nUsage: \n   !heatmap (days) - Heatmap of the last (days) days (default 28) \n   !heatmap daily - Toggle attaching the heatmap to the daily report'
+)
+async def heatmap(ctx, days: int = 28):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    days = max(1, min(days, MAX_STATS_DAYS))
+
+    png = await util.generate_heatmap_async(ctx.guild, days)
+    heatmap_file = discord.File(BytesIO(png), filename='voice_heatmap.png')
+    await util.send_embed(ctx, f'Voice activity by hour - last {days} {util.pluralize(days, "day", "days")}',
+                          'Average number of members in voice for each weekday and hour (server time).',
+                          discord.Color.blurple(), file=heatmap_file)
+
+
+@heatmap.command(name='daily', help='Toggle attaching the heatmap to the daily report.')
+async def heatmap_daily(ctx):
+    if ctx.guild is None:
+        await ctx.send('Error: This command can only be used in a server.')
+        return
+    if not await has_required_role(ctx.author):
+        await ctx.send("You do not have the required role to use this command.")
+        return
+
+    config = await util.load_config_async(ctx.guild.id)
+    daily_heatmap = not config.get('daily_heatmap', False)
+    config['daily_heatmap'] = daily_heatmap
+    await util.save_config_async(ctx.guild.id, config)
+
+    if daily_heatmap:
+        await ctx.send("The daily report will include the voice heatmap.")
+    else:
+        await ctx.send("The daily report will no longer include the voice heatmap.")
@@ -0,0 +1,51 @@
+# Standard library imports
+import asyncio
+import hashlib
+
+# Local imports
+import config
+
+REPORT_STAGGER_WINDOW = getattr(config, 'REPORT_STAGGER_WINDOW', 600)  # Seconds over which guild reports are spread
+REPORT_CONCURRENCY = getattr(config, 'REPORT_CONCURRENCY', 2)  # Guild reports rendered and uploaded at the same time
+
+
+def stagger_offset(guild_id, window=None):
+    """Seconds into the window at which a guild's report is delivered.
+
+    Derived from the guild id, so each guild keeps the same slot every day
+    and the slots stay spread out as guilds are added or removed.
+    """
+    window = REPORT_STAGGER_WINDOW if window is None else window
+    if window <= 0:
+        return 0.0
+    digest = hashlib.blake2b(str(guild_id).encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big') % int(window * 1000) / 1000
+
+
+async def _run(name, offset, report, start, semaphore, clock, sleep):
+    delay = start + offset - clock()
+    if delay > 0:
+        await sleep(delay)
+    async with semaphore:
+        try:
+            await report()
+        except Exception as exc:
+            print(f'[Daily Report] Report for {name} failed: {type(exc).__name__}: {exc}')
+            return exc
+
+
+async def run_staggered(jobs, concurrency=None, clock=None, sleep=asyncio.sleep):
+    """Run (name, offset, report) jobs, each starting `offset` seconds from now.
+
+    At most `concurrency` reports run at once; a report whose slot comes up
+    while others are still running waits for one to finish. A failing report
+    is logged and does not stop the others. Returns {name: exception} for
+    the reports that failed.
+    """
+    clock = clock or asyncio.get_running_loop().time
+    semaphore = asyncio.Semaphore(concurrency or REPORT_CONCURRENCY)
+    start = clock()
+    jobs = sorted(jobs, key=lambda job: job[1])
+    results = await asyncio.gather(*(_run(name, offset, report, start, semaphore, clock, sleep)
+                                     for name, offset, report in jobs))
+    return {name: result for (name, _, _), result in zip(jobs, results) if result is not None}
@@ -0,0 +1,206 @@
+# Standard library imports
+import asyncio
+import heapq
+import itertools
+import time
+from collections import deque
+
+# Third-party library imports
+import discord
+
+# Local imports
+import config
+
+OUTBOUND_RATE = getattr(config, 'OUTBOUND_RATE', 1.0)  # Sustained sends per second per channel
+OUTBOUND_BURST = getattr(config, 'OUTBOUND_BURST', 5)  # Sends allowed back to back per channel
+OUTBOUND_COALESCE_AFTER = getattr(config, 'OUTBOUND_COALESCE_AFTER', 3)  # Backlog that triggers coalescing
+OUTBOUND_RETRIES = getattr(config, 'OUTBOUND_RETRIES', 3)  # Extra attempts after a transient send error
+
+PRIORITY_HIGH = 0
+PRIORITY_LOG = 10
+
+# Discord allows 10 embeds and 6000 embed characters per message
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_MESSAGE_EMBED_LENGTH = 6000
+
+
+class TokenBucket:
+    """Allows `capacity` sends in a burst, refilled at `rate` sends per second."""
+
+    def __init__(self, rate, capacity, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._clock = clock
+        self._updated = clock()
+
+    def take(self):
+        """Take a token and return 0, or return the seconds until one is available."""
+        now = self._clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+
+def is_transient(exc):
+    """Whether a failed Discord call is worth retrying. Shared by the dispatcher and bulk moves."""
+    if isinstance(exc, discord.HTTPException):
+        # discord.py already waits out 429s it can predict; anything left is worth another try
+        return exc.status == 429 or exc.status >= 500
+    return isinstance(exc, (OSError, asyncio.TimeoutError))
+
+
+class _Outbound:
+    __slots__ = ('embed', 'coalesce', 'future', 'queued_at', 'priority', 'seq', 'attempts')
+
+    def __init__(self, embed, coalesce, future, queued_at, priority, seq):
+        self.embed = embed
+        self.coalesce = coalesce
+        self.future = future
+        self.queued_at = queued_at
+        self.priority = priority
+        self.seq = seq
+        self.attempts = 0
+
+
+class OutboundDispatcher:
+    """Queues embeds per channel and sends them within Discord's rate limits.
+
+    Each channel has its own token bucket and priority queue (lower priority
+    values go first). When at least `coalesce_after` coalescible messages are
+    waiting in a channel, up to ten of them go out together in one message,
+    unchanged, so a busy channel catches up with fewer sends. Sends that fail
+    with a transient error are put back in the queue and retried.
+    """
+
+    def __init__(self, rate=1.0, burst=5, coalesce_after=3, retries=3, retry_delay=1.0, clock=time.monotonic):
+        self.rate = rate
+        self.burst = burst
+        self.coalesce_after = coalesce_after
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self._clock = clock
+        self._seq = itertools.count()
+        self._channels = {}
+        self._queues = {}
+        self._buckets = {}
+        self._workers = {}
+        self._latencies = deque(maxlen=1000)
+        self.stats = {'queued': 0, 'sent_messages': 0, 'sent_events': 0, 'coalesced_events': 0, 'retried': 0, 'failed': 0}
+
+    def enqueue(self, channel, embed, priority=PRIORITY_LOG, coalesce=True):
+        """Queue an embed for the channel and return a future resolved once it is sent."""
+        future = asyncio.get_running_loop().create_future()
+        # Log events are fire-and-forget; mark failures as retrieved so they are not reported twice
+        future.add_done_callback(lambda done: done.cancelled() or done.exception())
+        queue = self._queues.setdefault(channel.id, [])
+        self._channels[channel.id] = channel
+        seq = next(self._seq)
+        heapq.heappush(queue, (priority, seq, _Outbound(embed, coalesce, future, self._clock(), priority, seq)))
+        self.stats['queued'] += 1
+
+        worker = self._workers.get(channel.id)
+        if worker is None or worker.done():
+            self._workers[channel.id] = asyncio.create_task(self._run(channel.id))
+        return future
+
+    def queue_depth(self, channel_id=None):
+        if channel_id is not None:
+            return len(self._queues.get(channel_id, ()))
+        return sum(len(queue) for queue in self._queues.values())
+
+    def latency_stats(self):
+        """Seconds from enqueue to send over the most recent sends."""
+        if not self._latencies:
+            return {'p50': 0.0, 'p99': 0.0, 'max': 0.0}
+        latencies = sorted(self._latencies)
+        return {
+            'p50': latencies[len(latencies) // 2],
+            'p99': latencies[min(int(len(latencies) * 0.99), len(latencies) - 1)],
+            'max': latencies[-1],
+        }
+
+    async def drain(self):
+        """Wait until every queued message has been sent."""
+        workers = [worker for worker in self._workers.values() if not worker.done()]
+        if workers:
+            await asyncio.gather(*workers, return_exceptions=True)
+
+    async def _run(self, channel_id):
+        queue = self._queues[channel_id]
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = TokenBucket(self.rate, self.burst, self._clock)
+
+        while queue:
+            delay = bucket.take()
+            while delay > 0:
+                await asyncio.sleep(delay)
+                delay = bucket.take()
+
+            items = self._take(queue)
+            try:
+                if len(items) == 1:
+                    message = await self._channels[channel_id].send(embed=items[0].embed)
+                else:
+                    message = await self._channels[channel_id].send(embeds=[item.embed for item in items])
+            except Exception as exc:
+                await self._failed(channel_id, queue, items, exc)
+                continue
+
+            now = self._clock()
+            self.stats['sent_messages'] += 1
+            self.stats['sent_events'] += len(items)
+            if len(items) > 1:
+                self.stats['coalesced_events'] += len(items)
+            for item in items:
+                self._latencies.append(now - item.queued_at)
+                if not item.future.done():
+                    item.future.set_result(message)
+
+        del self._queues[channel_id]
+        self._channels.pop(channel_id, None)
+
+    async def _failed(self, channel_id, queue, items, exc):
+        """Put items back for another attempt after a transient error, or fail them."""
+        retry = []
+        for item in items:
+            item.attempts += 1
+            if is_transient(exc) and item.attempts <= self.retries:
+                retry.append(item)
+            else:
+                self.stats['failed'] += 1
+                if not item.future.done():
+                    item.future.set_exception(exc)
+
+        if retry:
+            self.stats['retried'] += len(retry)
+            print(f'[Dispatcher] Retrying {len(retry)} messages to channel {channel_id} after: {exc}')
+            for item in retry:
+                # Same priority and sequence number, so retried messages keep their place
+                heapq.heappush(queue, (item.priority, item.seq, item))
+            await asyncio.sleep(self.retry_delay * 2 ** (max(item.attempts for item in retry) - 1))
+        else:
+            print(f'[Dispatcher] Failed to send to channel {channel_id}: {exc}')
+
+    def _take(self, queue):
+        """Pop the next message, plus any coalescible backlog that fits in the same message."""
+        _, _, first = heapq.heappop(queue)
+        items = [first]
+        if not first.coalesce or len(queue) + 1 < self.coalesce_after:
+            return items
+
+        length = len(first.embed)
+        while queue and queue[0][2].coalesce and len(items) < MAX_EMBEDS_PER_MESSAGE:
+            embed_length = len(queue[0][2].embed)
+            if length + embed_length > MAX_MESSAGE_EMBED_LENGTH:
+                break
+            length += embed_length
+            items.append(heapq.heappop(queue)[2])
+        return items
+
+
+outbound = OutboundDispatcher(OUTBOUND_RATE, OUTBOUND_BURST, OUTBOUND_COALESCE_AFTER, OUTBOUND_RETRIES)
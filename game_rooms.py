@@ -0,0 +1,162 @@
+# Standard library imports
+import asyncio
+import heapq
+
+# Third-party library imports
+import discord
+
+GAME_ROOM_CATEGORIES = ("Member Game Rooms", "Public Game Rooms")
+GAME_ROOM_PREFIX = "Game Room "
+
+
+def room_number(channel):
+    """Return N for a voice channel named "Game Room N", otherwise None."""
+    if not isinstance(channel, discord.VoiceChannel) or not channel.name.startswith(GAME_ROOM_PREFIX):
+        return None
+    try:
+        return int(channel.name[len(GAME_ROOM_PREFIX):])
+    except ValueError:
+        return None
+
+
+def is_monitored(category):
+    return category is not None and category.name in GAME_ROOM_CATEGORIES
+
+
+class RoomAllocator:
+    """Keeps one empty "Game Room N" available in a category.
+
+    Rooms are tracked in memory and kept in sync from channel events, so a
+    reconciliation pass only looks at the rooms of its own category. Free
+    numbers are kept in a min-heap, so a new room always takes the lowest
+    unused number.
+    """
+
+    def __init__(self, category, max_rooms, debounce):
+        self.category = category
+        self.max_rooms = max_rooms
+        self.debounce = debounce
+        self.rooms = {}
+        # discord.py renames cached channels in place, so remember the indexed number
+        self._numbers = {}
+        self._free = list(range(1, max_rooms + 1))
+        self._lock = asyncio.Lock()
+        self._dirty = False
+        self._task = None
+        for channel in category.voice_channels:
+            self.add(channel)
+
+    def add(self, channel):
+        number = room_number(channel)
+        if number is not None:
+            self.rooms[channel.id] = channel
+            self._numbers[channel.id] = number
+
+    def remove(self, channel):
+        if self.rooms.pop(channel.id, None) is not None:
+            # Numbers still in use are skipped when popped, so duplicates are harmless
+            heapq.heappush(self._free, self._numbers.pop(channel.id))
+
+    def schedule(self):
+        """Request a reconciliation pass. Requests within the debounce window share one pass."""
+        self._dirty = True
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def cancel(self):
+        """Stop a pending pass; the allocator is being replaced."""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+
+    async def _run(self):
+        while self._dirty:
+            await asyncio.sleep(self.debounce)
+            self._dirty = False
+            async with self._lock:
+                try:
+                    await self.reconcile()
+                except discord.HTTPException as exc:
+                    print(f"[GameRooms] Failed to update rooms in {self.category.name}: {exc}")
+
+    async def reconcile(self):
+        """Delete empty rooms except the lowest-numbered one, then add a room if none is free."""
+        rooms = sorted(self.rooms.values(), key=lambda room: self._numbers[room.id])
+        for room in rooms[1:]:
+            if not room.members:
+                try:
+                    await room.delete()
+                except discord.NotFound:
+                    pass
+                # Only free the number once the room is gone, or a failed delete leaves a duplicate behind
+                self.remove(room)
+
+        rooms = sorted(self.rooms.values(), key=lambda room: self._numbers[room.id])
+        if all(room.members for room in rooms) and len(rooms) < self.max_rooms:
+            number = self._next_free_number()
+            if number is not None:
+                try:
+                    channel = await self.category.guild.create_voice_channel(GAME_ROOM_PREFIX + str(number), category=self.category)
+                except Exception:
+                    heapq.heappush(self._free, number)
+                    raise
+                self.add(channel)
+
+    def _next_free_number(self):
+        used = set(self._numbers.values())
+        while self._free:
+            number = heapq.heappop(self._free)
+            if number not in used:
+                return number
+        return None
+
+
+class RoomAllocators:
+    """One RoomAllocator per monitored category, created on first use."""
+
+    def __init__(self, max_rooms, debounce):
+        self.max_rooms = max_rooms
+        self.debounce = debounce
+        self._allocators = {}
+
+    def get(self, category):
+        allocator = self._allocators.get(category.id)
+        if allocator is None:
+            allocator = self._allocators[category.id] = RoomAllocator(category, self.max_rooms, self.debounce)
+        return allocator
+
+    def voice_channel_changed(self, channel):
+        """Schedule a pass for the category of a channel someone joined or left."""
+        if channel is not None and is_monitored(channel.category):
+            self.get(channel.category).schedule()
+
+    def channel_created(self, channel):
+        allocator = self._allocators.get(getattr(channel, 'category_id', None))
+        if allocator is not None:
+            allocator.add(channel)
+
+    def _drop(self, category_id):
+        allocator = self._allocators.pop(category_id, None)
+        if allocator is not None:
+            allocator.cancel()
+
+    def channel_deleted(self, channel):
+        if isinstance(channel, discord.CategoryChannel):
+            self._drop(channel.id)
+            return
+        allocator = self._allocators.get(getattr(channel, 'category_id', None))
+        if allocator is not None:
+            allocator.remove(channel)
+
+    def channel_updated(self, before, after):
+        if isinstance(after, discord.CategoryChannel):
+            if not is_monitored(after):
+                self._drop(after.id)
+            return
+        self.channel_deleted(before)
+        self.channel_created(after)
+
+    def drop_guild(self, guild):
+        """Forget a guild's allocators; they are rebuilt from the current channels on next use."""
+        for category_id in [category_id for category_id, allocator in self._allocators.items()
+                            if allocator.category.guild.id == guild.id]:
+            self._drop(category_id)
@@ -0,0 +1,111 @@
+class _NameIndex:
+    """Objects keyed by id and by exact and case-insensitive name.
+
+    Names are not unique in Discord (two categories can both hold a "Game
+    Room 1"), so each name maps to every object carrying it, in the order
+    they were added.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_name = {}
+        self.by_folded_name = {}
+        # discord.py renames cached objects in place, so remember the indexed name
+        self._names = {}
+
+    def add(self, obj):
+        if obj.id in self.by_id:
+            self.remove(obj)
+        self.by_id[obj.id] = obj
+        self._names[obj.id] = obj.name
+        self.by_name.setdefault(obj.name, {})[obj.id] = obj
+        self.by_folded_name.setdefault(obj.name.casefold(), {})[obj.id] = obj
+
+    def remove(self, obj):
+        if self.by_id.pop(obj.id, None) is None:
+            return
+        name = self._names.pop(obj.id)
+        for index, key in ((self.by_name, name), (self.by_folded_name, name.casefold())):
+            entries = index.get(key)
+            if entries is not None:
+                entries.pop(obj.id, None)
+                if not entries:
+                    del index[key]
+
+    def get_by_id(self, id):
+        return self.by_id.get(id)
+
+    def get_by_name(self, name, case_insensitive=False, kind=None):
+        if case_insensitive:
+            entries = self.by_folded_name.get(name.casefold())
+        else:
+            entries = self.by_name.get(name)
+        if not entries:
+            return None
+        for obj in entries.values():
+            if kind is None or isinstance(obj, kind):
+                return obj
+        return None
+
+
+class GuildIndex:
+    """Members, channels and roles of one guild, kept in sync from gateway events."""
+
+    def __init__(self, guild):
+        self.guild_id = guild.id
+        self.members = _NameIndex()
+        self.channels = _NameIndex()
+        self.roles = _NameIndex()
+        for member in guild.members:
+            self.members.add(member)
+        for channel in guild.channels:
+            self.channels.add(channel)
+        for role in guild.roles:
+            self.roles.add(role)
+
+
+_indexes = {}
+
+
+def get_index(guild):
+    """Return the guild's index, building it on first use."""
+    index = _indexes.get(guild.id)
+    if index is None:
+        index = _indexes[guild.id] = GuildIndex(guild)
+    return index
+
+
+def rebuild(guild):
+    _indexes[guild.id] = GuildIndex(guild)
+
+
+def drop(guild):
+    _indexes.pop(guild.id, None)
+
+
+# The add_* helpers also handle updates: re-adding an object replaces the
+# entry stored under its previous name.
+
+
+def add_member(member):
+    get_index(member.guild).members.add(member)
+
+
+def remove_member(member):
+    get_index(member.guild).members.remove(member)
+
+
+def add_channel(channel):
+    get_index(channel.guild).channels.add(channel)
+
+
+def remove_channel(channel):
+    get_index(channel.guild).channels.remove(channel)
+
+
+def add_role(role):
+    get_index(role.guild).roles.add(role)
+
+
+def remove_role(role):
+    get_index(role.guild).roles.remove(role)
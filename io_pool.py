@@ -0,0 +1,55 @@
+# Standard library imports
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Local imports
+import config
+import prometheus
+
+IO_WORKERS = getattr(config, 'IO_WORKERS', 4)
+IO_QUEUE_LIMIT = getattr(config, 'IO_QUEUE_LIMIT', 64)  # Max calls queued or running at once
+SLOW_IO_THRESHOLD = getattr(config, 'SLOW_IO_THRESHOLD', 0.25)  # Seconds
+
+_executor = ThreadPoolExecutor(max_workers=IO_WORKERS, thread_name_prefix='storage-io')
+_slots = None
+
+io_stats = {'calls': 0, 'slow_calls': 0, 'total_seconds': 0.0, 'in_flight': 0}
+
+
+def _get_slots():
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(IO_QUEUE_LIMIT)
+    return _slots
+
+
+async def run_io(func, *args, **kwargs):
+    """Run a blocking storage call in the I/O pool and await its result.
+
+    Callers wait for a free slot once IO_QUEUE_LIMIT calls are outstanding, so
+    an event storm applies backpressure instead of growing an unbounded queue.
+    """
+    loop = asyncio.get_running_loop()
+    io_stats['in_flight'] += 1
+    try:
+        async with _get_slots():
+            start = time.perf_counter()
+            try:
+                return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+            finally:
+                elapsed = time.perf_counter() - start
+                io_stats['calls'] += 1
+                io_stats['total_seconds'] += elapsed
+                prometheus.STORAGE_SECONDS.observe(elapsed, getattr(func, '__name__', 'unknown'))
+                if elapsed > SLOW_IO_THRESHOLD:
+                    io_stats['slow_calls'] += 1
+                    print(f'[Storage] Slow I/O: {getattr(func, "__name__", func)} took {elapsed * 1000:.0f}ms')
+    finally:
+        io_stats['in_flight'] -= 1
+
+
+def shutdown():
+    """Wait for outstanding I/O to finish."""
+    _executor.shutdown(wait=True)
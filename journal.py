@@ -0,0 +1,268 @@
+# Standard library imports
+import datetime
+import os
+import threading
+import time
+
+# Third-party library imports
+import pytz
+
+# Local imports
+import config
+from storage import GUILDS_DIR
+
+JOURNAL_RETAIN_DAYS = getattr(config, 'JOURNAL_RETAIN_DAYS', 14)  # Raw segments kept before compaction
+
+# Raw voice events, one segment file per guild and server-timezone day:
+# guilds/<guild id>/journal/<YYYY-MM-DD>.bin
+EVENT_MAGIC = b'TLEVOICE\x01\x00\x00\x00\x00\x00\x00\x00'
+EVENT_FIELDS = [('ts', '<i8'), ('user', '<u8'), ('source', '<u8'), ('target', '<u8'), ('kind', 'u1'), ('flags', 'u1')]
+
+# Compacted segments become closed sessions in guilds/<guild id>/journal/sessions.bin
+SESSION_MAGIC = b'TLESESSN\x01\x00\x00\x00\x00\x00\x00\x00'
+SESSION_FIELDS = [('day', '<i4'), ('user', '<u8'), ('channel', '<u8'), ('start', '<i8'), ('end', '<i8'), ('counted', 'u1')]
+
+# The layouts above are numpy dtype specs; numpy is only imported once a file is read or written.
+# Files are read and appended through series, which handles the header and interrupted appends.
+
+JOIN, LEAVE, SWITCH, BOOT, PRESENT = 1, 2, 3, 4, 5
+SOURCE_COUNTED, TARGET_COUNTED = 1, 2
+
+
+def replay(events, day_start, day_end):
+    """Rebuild closed sessions from one day's events.
+
+    Sessions still open at the end of the segment are closed at day_end. A
+    leave or switch with no matching join started before the segment (or
+    before the last restart) and is counted from then, and so is a PRESENT
+    snapshot of someone with no earlier event in the segment; the daily
+    snapshot is what carries a session through days in which it has no
+    events of its own. A BOOT marker closes everything that was open at the
+    last event seen before it, so downtime is never counted.
+    """
+    import numpy as np
+
+    sessions = []
+    open_sessions = {}
+    seen = set()
+    floor = last_seen = day_start
+    for ts, user, source, target, kind, flags in zip(
+            events['ts'].tolist(), events['user'].tolist(), events['source'].tolist(),
+            events['target'].tolist(), events['kind'].tolist(), events['flags'].tolist()):
+        if kind == BOOT:
+            for open_user, (channel, start, counted) in open_sessions.items():
+                sessions.append((open_user, channel, start, last_seen, counted))
+            open_sessions.clear()
+            floor = last_seen = ts
+            continue
+
+        if kind in (LEAVE, SWITCH):
+            channel, start, counted = open_sessions.pop(user, (source, floor, bool(flags & SOURCE_COUNTED)))
+            sessions.append((user, channel, start, ts, counted))
+        if kind == PRESENT and user in open_sessions and open_sessions[user][0] == target:
+            # Already known to be there
+            pass
+        elif kind in (JOIN, SWITCH, PRESENT):
+            if user in open_sessions:
+                # A missed leave; the new event is the best end we know
+                channel, start, counted = open_sessions.pop(user)
+                sessions.append((user, channel, start, ts, counted))
+            start = floor if kind == PRESENT and user not in seen else ts
+            open_sessions[user] = (target, start, bool(flags & TARGET_COUNTED))
+        seen.add(user)
+        last_seen = ts
+
+    for user, (channel, start, counted) in open_sessions.items():
+        sessions.append((user, channel, start, max(day_end, start), counted))
+
+    records = np.zeros(len(sessions), dtype=SESSION_FIELDS)
+    if sessions:
+        users, channels, starts, ends, counted = zip(*sessions)
+        records['user'] = users
+        records['channel'] = channels
+        records['start'] = starts
+        records['end'] = ends
+        records['counted'] = counted
+    return records
+
+
+def summarize(sessions):
+    """Unique users and voice minutes for a set of sessions."""
+    import numpy as np
+
+    counted = sessions[sessions['counted'] == 1]
+    return {
+        'unique_users': int(np.unique(sessions['user']).size),
+        'voice_minutes': int((counted['end'] - counted['start']).sum() // 60000),
+        'sessions': int(len(sessions)),
+    }
+
+
+class VoiceJournal:
+    """Append-only journal of every voice join, leave and switch per guild.
+
+    Events are buffered in memory and written by flush() with one append and
+    one fsync per segment. Segments older than JOURNAL_RETAIN_DAYS are
+    compacted into closed sessions, which is all the history queries need.
+    """
+
+    def __init__(self, root=GUILDS_DIR, timezone=None, clock=time.time):
+        self.root = root
+        self.timezone = pytz.timezone(timezone or config.SERVER_TIMEZONE)
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._buffer = {}
+        self.stats = {'events': 0, 'flushes': 0, 'compacted_days': 0}
+
+    # Layout
+
+    def _dir(self, guild_id):
+        return os.path.join(self.root, str(guild_id), 'journal')
+
+    def segment_path(self, guild_id, day):
+        return os.path.join(self._dir(guild_id), f'{day.isoformat()}.bin')
+
+    def sessions_path(self, guild_id):
+        return os.path.join(self._dir(guild_id), 'sessions.bin')
+
+    def now(self):
+        return self._clock()
+
+    def day_of(self, ts):
+        return datetime.datetime.fromtimestamp(ts, self.timezone).date()
+
+    def day_bounds(self, day):
+        """Start and end of a server-timezone day, in epoch milliseconds."""
+        start = self.timezone.localize(datetime.datetime.combine(day, datetime.time()))
+        end = self.timezone.localize(datetime.datetime.combine(day + datetime.timedelta(days=1), datetime.time()))
+        return int(start.timestamp() * 1000), int(end.timestamp() * 1000)
+
+    def segment_days(self, guild_id):
+        try:
+            names = os.listdir(self._dir(guild_id))
+        except FileNotFoundError:
+            return []
+        return sorted(datetime.date.fromisoformat(name[:-4]) for name in names
+                      if name.endswith('.bin') and name != 'sessions.bin')
+
+    # Writing
+
+    def record(self, guild_id, user_id, before_channel, after_channel, counted=None):
+        """Buffer a voice state change. counted(channel) decides whether time in a channel counts."""
+        if before_channel == after_channel:
+            return
+        if before_channel is None:
+            kind = JOIN
+        elif after_channel is None:
+            kind = LEAVE
+        else:
+            kind = SWITCH
+        flags = 0
+        if before_channel is not None and (counted is None or counted(before_channel)):
+            flags |= SOURCE_COUNTED
+        if after_channel is not None and (counted is None or counted(after_channel)):
+            flags |= TARGET_COUNTED
+        self._add(guild_id, (self._now_ms(), user_id,
+                             before_channel.id if before_channel is not None else 0,
+                             after_channel.id if after_channel is not None else 0, kind, flags))
+
+    def record_boot(self, guild_id, live_states):
+        """Mark a (re)start and who is in voice now. live_states yields (user_id, channel_id, counted)."""
+        self._add(guild_id, (self._now_ms(), 0, 0, 0, BOOT, 0))
+        self.record_present(guild_id, live_states)
+
+    def record_present(self, guild_id, live_states):
+        """Note who is in voice now, so sessions spanning whole days appear in each day's segment."""
+        now = self._now_ms()
+        for user_id, channel_id, counted in live_states:
+            self._add(guild_id, (now, user_id, 0, channel_id, PRESENT, TARGET_COUNTED if counted else 0))
+
+    def _now_ms(self):
+        return int(self._clock() * 1000)
+
+    def _add(self, guild_id, event):
+        day = self.day_of(event[0] / 1000)
+        with self._lock:
+            self._buffer.setdefault((int(guild_id), day), []).append(event)
+            self.stats['events'] += 1
+
+    def flush(self):
+        """Write buffered events, one append and fsync per segment. Blocking; run it in the I/O pool."""
+        import series
+
+        with self._lock:
+            buffer, self._buffer = self._buffer, {}
+        for (guild_id, day), events in buffer.items():
+            series.append(self.segment_path(guild_id, day), events, EVENT_MAGIC, EVENT_FIELDS, sync=True)
+        if buffer:
+            self.stats['flushes'] += 1
+
+    # Reading
+
+    def load_events(self, guild_id, day):
+        import series
+
+        return series.open_series(self.segment_path(guild_id, day), EVENT_MAGIC, EVENT_FIELDS)
+
+    def replay_day(self, guild_id, day):
+        """Closed sessions for one day from its raw segment (open sessions end now or at midnight)."""
+        day_start, day_end = self.day_bounds(day)
+        sessions = replay(self.load_events(guild_id, day), day_start, min(day_end, self._now_ms()))
+        sessions['day'] = (day - datetime.date(1970, 1, 1)).days
+        return sessions
+
+    def load_sessions(self, guild_id, first_day=None, last_day=None):
+        """Sessions from compacted history and raw segments, for days in [first_day, last_day]."""
+        import numpy as np
+
+        import series
+
+        epoch = datetime.date(1970, 1, 1)
+        compacted = series.open_series(self.sessions_path(guild_id), SESSION_MAGIC, SESSION_FIELDS)
+        mask = np.ones(len(compacted), dtype=bool)
+        if first_day is not None:
+            mask &= compacted['day'] >= (first_day - epoch).days
+        if last_day is not None:
+            mask &= compacted['day'] <= (last_day - epoch).days
+        parts = [np.asarray(compacted[mask])]
+
+        for day in self.segment_days(guild_id):
+            if (first_day is None or day >= first_day) and (last_day is None or day <= last_day):
+                parts.append(self.replay_day(guild_id, day))
+        return np.concatenate(parts)
+
+    def day_stats(self, guild_id, day):
+        """Recompute a day's unique users, voice minutes and session count."""
+        return summarize(self.load_sessions(guild_id, day, day))
+
+    # Compaction
+
+    def compact(self, guild_id, today=None):
+        """Fold raw segments older than JOURNAL_RETAIN_DAYS into sessions.bin and delete them."""
+        import series
+
+        today = today or self.day_of(self._clock())
+        cutoff = today - datetime.timedelta(days=JOURNAL_RETAIN_DAYS)
+        compacted = series.open_series(self.sessions_path(guild_id), SESSION_MAGIC, SESSION_FIELDS)
+        last_compacted = int(compacted['day'][-1]) if len(compacted) else None
+        del compacted
+
+        for day in self.segment_days(guild_id):
+            if day >= cutoff:
+                break
+            epoch_day = (day - datetime.date(1970, 1, 1)).days
+            # Days are compacted in order, so an interrupted run never appends a day twice
+            if last_compacted is None or epoch_day > last_compacted:
+                sessions = self.replay_day(guild_id, day)
+                if len(sessions):
+                    series.append(self.sessions_path(guild_id), sessions, SESSION_MAGIC, SESSION_FIELDS, sync=True)
+                    last_compacted = epoch_day
+            os.remove(self.segment_path(guild_id, day))
+            self.stats['compacted_days'] += 1
+
+    def compact_all(self, guild_ids):
+        for guild_id in guild_ids:
+            self.compact(guild_id)
+
+
+voice_journal = VoiceJournal()
@@ -0,0 +1,111 @@
+# Standard library imports
+import asyncio
+
+# Third-party library imports
+import discord
+
+# Local imports
+import guild_index
+
+DAILY_REPORTS_THREAD_NAME = 'Daily Reports'
+
+
+class _LogTargets:
+    __slots__ = ('name', 'channel', 'thread')
+
+    def __init__(self, name, channel):
+        self.name = name
+        self.channel = channel
+        self.thread = None
+
+
+_cache = {}
+_locks = {}
+
+
+def _lock(guild_id):
+    lock = _locks.get(guild_id)
+    if lock is None:
+        lock = _locks[guild_id] = asyncio.Lock()
+    return lock
+
+
+async def get_log_channel(guild, name):
+    """Return the guild's log channel, creating it if it does not exist.
+
+    The channel is cached per guild. Lookups and creation are serialised by a
+    per-guild lock, so concurrent events never create duplicate channels.
+    """
+    targets = _cache.get(guild.id)
+    if targets is not None and targets.name == name:
+        return targets.channel
+
+    async with _lock(guild.id):
+        targets = _cache.get(guild.id)
+        if targets is not None and targets.name == name:
+            return targets.channel
+
+        channel = guild_index.get_index(guild).channels.get_by_name(name, kind=discord.TextChannel)
+        if channel is None:
+            overwrites = {
+                guild.default_role: discord.PermissionOverwrite(
+                    read_messages=False)
+            }
+            channel = await guild.create_text_channel(name, overwrites=overwrites)
+            guild_index.add_channel(channel)
+
+        _cache[guild.id] = _LogTargets(name, channel)
+        return channel
+
+
+async def get_daily_reports_thread(guild, name):
+    """Return the "Daily Reports" thread under the log channel, creating either if needed."""
+    channel = await get_log_channel(guild, name)
+    targets = _cache[guild.id]
+    if targets.thread is not None:
+        return targets.thread
+
+    async with _lock(guild.id):
+        targets = _cache.get(guild.id)
+        if targets is None or targets.channel is not channel:
+            # Invalidated while waiting for the lock
+            return await get_daily_reports_thread(guild, name)
+        if targets.thread is not None:
+            return targets.thread
+
+        thread = discord.utils.get(channel.threads, name=DAILY_REPORTS_THREAD_NAME)
+        if thread is None:
+            # Threads archived after a week of inactivity are not in the cache
+            try:
+                async for archived in channel.archived_threads(limit=None):
+                    if archived.name == DAILY_REPORTS_THREAD_NAME:
+                        thread = archived
+                        break
+            except discord.HTTPException as exc:
+                print(f'Could not list archived threads in {channel.name}: {exc}')
+        if thread is None:
+            thread = await channel.create_thread(name=DAILY_REPORTS_THREAD_NAME, type=discord.ChannelType.public_thread, auto_archive_duration=10080)
+
+        targets.thread = thread
+        return thread
+
+
+def invalidate(guild_id):
+    """Forget the cached log channel and thread, e.g. after the log channel name changes."""
+    _cache.pop(guild_id, None)
+
+
+def channel_deleted(channel):
+    targets = _cache.get(channel.guild.id)
+    if targets is None:
+        return
+    if targets.channel.id == channel.id:
+        invalidate(channel.guild.id)
+    elif targets.thread is not None and targets.thread.id == channel.id:
+        targets.thread = None
+
+
+def channel_updated(before, after):
+    """Drop the cache when a rename could change which channel or thread is the log target."""
+    if before.name != after.name:
+        invalidate(after.guild.id)
@@ -0,0 +1,61 @@
+class GuildMetrics:
+    """Counters for one guild, kept current from gateway events."""
+
+    __slots__ = ('guild_id', 'total_members', 'in_voice', 'unique_today')
+
+    def __init__(self, guild_id, total_members=0, in_voice=0, unique_today=()):
+        self.guild_id = guild_id
+        self.total_members = total_members
+        self.in_voice = in_voice
+        self.unique_today = set(unique_today)
+
+
+class MetricsTracker:
+    """Per-guild metrics that can be read in O(guilds) without touching disk.
+
+    Member and voice counts are adjusted from events and rebuilt with a full
+    scan only on ready and at the daily rollover. Voice minutes are read from
+    the session engine, which already keeps them in memory.
+    """
+
+    def __init__(self, voice_engine):
+        self.voice_engine = voice_engine
+        self._guilds = {}
+
+    def rebuild(self, guild, unique_user_ids=()):
+        self._guilds[guild.id] = GuildMetrics(
+            guild.id,
+            total_members=len(guild.members),
+            in_voice=sum(1 for member in guild.members if member.voice),
+            unique_today=unique_user_ids)
+
+    def drop(self, guild):
+        self._guilds.pop(guild.id, None)
+
+    def _get(self, guild_id):
+        metrics = self._guilds.get(guild_id)
+        if metrics is None:
+            metrics = self._guilds[guild_id] = GuildMetrics(guild_id)
+        return metrics
+
+    def member_joined(self, guild_id):
+        self._get(guild_id).total_members += 1
+
+    def member_left(self, guild_id):
+        metrics = self._get(guild_id)
+        metrics.total_members = max(metrics.total_members - 1, 0)
+
+    def voice_joined(self, guild_id, user_id):
+        metrics = self._get(guild_id)
+        metrics.in_voice += 1
+        metrics.unique_today.add(user_id)
+
+    def voice_left(self, guild_id):
+        metrics = self._get(guild_id)
+        metrics.in_voice = max(metrics.in_voice - 1, 0)
+
+    def snapshot(self, guild_id):
+        """Return (total members, in voice, unique today, minutes today) for the guild."""
+        metrics = self._get(guild_id)
+        return (metrics.total_members, metrics.in_voice, len(metrics.unique_today),
+                self.voice_engine.voice_minutes(guild_id))
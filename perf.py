@@ -0,0 +1,120 @@
+# Standard library imports
+import functools
+import random
+import time
+
+# Local imports
+import config
+import prometheus
+
+PERF_SLOW_THRESHOLD = getattr(config, 'PERF_SLOW_THRESHOLD', 0.5)  # Seconds before a call is logged as slow
+PERF_RESERVOIR_SIZE = getattr(config, 'PERF_RESERVOIR_SIZE', 512)  # Latency samples kept per handler
+
+
+class Reservoir:
+    """A fixed-size uniform sample of latencies plus exact count, total and max.
+
+    Memory stays constant however often a handler runs; percentiles are
+    estimated from the sample.
+    """
+
+    __slots__ = ('size', 'samples', 'count', 'errors', 'total', 'max')
+
+    def __init__(self, size=PERF_RESERVOIR_SIZE):
+        self.size = size
+        self.samples = []
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.max = max(self.max, value)
+        if len(self.samples) < self.size:
+            self.samples.append(value)
+        else:
+            # Algorithm R: every call so far has the same chance of being sampled
+            index = random.randrange(self.count)
+            if index < self.size:
+                self.samples[index] = value
+
+    def percentile(self, fraction):
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+_stats = {}
+
+
+def record(name, elapsed, failed=False):
+    reservoir = _stats.get(name)
+    if reservoir is None:
+        reservoir = _stats[name] = Reservoir()
+    reservoir.add(elapsed)
+    if failed:
+        reservoir.errors += 1
+    if elapsed > PERF_SLOW_THRESHOLD:
+        print(f'[Perf] Slow {name}: {elapsed * 1000:.0f}ms')
+
+
+def instrument(name, event=None):
+    """Decorate a coroutine function so each call is timed and recorded under `name`.
+
+    Event handlers pass their event name so the call is also exported to Prometheus.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = False
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                failed = True
+                raise
+            finally:
+                elapsed = time.perf_counter() - start
+                record(name, elapsed, failed)
+                if event is not None:
+                    prometheus.EVENTS.inc(event)
+                    prometheus.EVENT_SECONDS.observe(elapsed, event)
+                    if failed:
+                        prometheus.EVENT_ERRORS.inc(event)
+        wrapper.instrumented = True
+        return wrapper
+    return decorator
+
+
+def instrument_bot(bot, loops=()):
+    """Time every @bot.event handler, the given tasks.loop tasks, and every command."""
+    for attribute, handler in list(vars(bot).items()):
+        if attribute.startswith('on_') and callable(handler) and not getattr(handler, 'instrumented', False):
+            setattr(bot, attribute, instrument(f'event:{attribute}', event=attribute)(handler))
+
+    for loop in loops:
+        if not getattr(loop.coro, 'instrumented', False):
+            loop.coro = instrument(f'task:{loop.coro.__name__}')(loop.coro)
+
+    # Commands are timed through the invoke hooks, so their signatures stay untouched
+    if not getattr(bot, '_before_invoke', None):
+        bot.before_invoke(_before_command)
+        bot.after_invoke(_after_command)
+
+
+async def _before_command(ctx):
+    ctx.perf_started = time.perf_counter()
+
+
+async def _after_command(ctx):
+    started = getattr(ctx, 'perf_started', None)
+    if started is not None:
+        record(f'command:{ctx.command.qualified_name}', time.perf_counter() - started, ctx.command_failed)
+
+
+def top(limit=15):
+    """(name, reservoir) pairs for the handlers with the most total time."""
+    return sorted(_stats.items(), key=lambda item: item[1].total, reverse=True)[:limit]
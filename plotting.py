@@ -0,0 +1,138 @@
+# Standard library imports
+from io import BytesIO
+
+# matplotlib and numpy are imported on first render so that importing this
+# module stays cheap; the plot worker process pays the cost once.
+
+PLOT_DAYS = 30
+
+
+def render_daily_plot(plot_data):
+    """Render the daily report figure and return it as PNG bytes.
+
+    plot_data is a list of (guild_name, records, summary) tuples, where
+    records is a series.RECORD_DTYPE array of the last PLOT_DAYS days and
+    summary holds the all-time aggregates, so it can be pickled into a worker
+    process.
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    import matplotlib.dates as mdates
+    from matplotlib.ticker import MaxNLocator
+    import numpy as np
+
+    import series
+
+    plt.figure()
+
+    # Loop through each guild and plot the data
+    for guild_name, records, summary in plot_data:
+        if len(records) == 0:
+            continue
+        # Use only the bottom x rows of the data
+        records = records[-PLOT_DAYS:]
+
+        dates = records['day'].astype('datetime64[D]')
+        unique_users = records['unique_users']
+        # Records from before voice minutes were tracked have no minutes
+        total_voice_hours = np.where(records['voice_minutes'] == series.NO_MINUTES, 0, records['voice_minutes']) / 60.0
+
+        max_value = summary['max_unique_users']
+        max_value_date = str(summary['max_unique_users_date'])[:10]
+
+        mean_value = unique_users.mean()
+        median_value = np.median(unique_users)
+        std_dev = unique_users.std(ddof=1) if len(unique_users) > 1 else float('nan')
+
+        fig, ax1 = plt.subplots()
+
+        color = 'tab:blue'
+        ax1.set_xlabel('Date')
+        ax1.set_ylabel('Unique Users', color=color)
+        ax1.bar(dates, unique_users, color=color, alpha=0.6, label=f'{guild_name} - Unique Users')
+        ax1.tick_params(axis='y', labelcolor=color)
+
+        ax2 = ax1.twinx()  # Instantiate a second axes that shares the same x-axis
+        color = 'tab:red'
+        ax2.set_ylabel('Total Voice Hours', color=color)
+        ax2.plot(dates, total_voice_hours.round(2), label=f'{guild_name} - Total Voice Hours', color=color, linestyle='--')
+        ax2.tick_params(axis='y', labelcolor=color)
+
+        # Compute the coefficients of the linear trendline for unique users
+        x = np.arange(len(records))
+        coeffs = np.polyfit(x, unique_users, 1)
+        trendline = coeffs[0] * x + coeffs[1]
+        trendline_plot, = ax1.plot(dates, trendline, label=f'Trend ({coeffs[0]:.2f}x + {coeffs[1]:.2f})', color='tab:blue', linestyle='--')
+
+        # Fill the area between the trendline and the unique_users plot
+        ax1.fill_between(dates, unique_users, trendline, where=(unique_users > trendline), interpolate=True, alpha=0.3, color='tab:blue', edgecolor='none')
+
+        # Label the final data point for unique users
+        final_date = dates[-1].astype(object)
+        final_value = unique_users[-1]
+        ax1.text(final_date, final_value, f'{final_value}', color='tab:blue')
+
+        # Label the final data point for total voice hours
+        final_voice_hours_value = total_voice_hours.round(1)[-1]
+        ax2.text(final_date, final_voice_hours_value, f'{final_voice_hours_value}', color='tab:red')
+
+        # Display statistical information along the bottom of the graph
+        stats_text = (
+            f'Mean: {mean_value:.2f}\n'
+            f'Median: {median_value}\n'
+            f'Std Deviation: {std_dev:.2f}\n'
+            f'Max: {max_value} on {max_value_date}'
+        )
+        plt.figtext(0.1225, 0.25, stats_text, horizontalalignment='left', verticalalignment='bottom')
+
+        # Format the x-axis to show dates properly
+        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
+        ax1.xaxis.set_major_locator(mdates.DayLocator(interval=5))
+        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45)
+
+        ax1.yaxis.set_major_locator(MaxNLocator(integer=True))
+
+        # Add a legend
+        fig.legend(handles=[trendline_plot], loc='upper left')
+        fig.tight_layout()  # Otherwise the right y-label is slightly clipped
+        fig.subplots_adjust(top=0.93)  # Adjust the top padding to ensure the title is not cut off
+
+    plt.title(f'Daily Voice Channel Usage')
+
+    # Save the plot as an image
+    buffer = BytesIO()
+    plt.savefig(buffer, format='png')
+    plt.close('all')
+
+    return buffer.getvalue()
+
+
+def render_heatmap(guild_name, grid, days):
+    """Render a 7x24 hour-of-week grid of average concurrent voice users as PNG bytes."""
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 3.6))
+    image = ax.imshow(grid, aspect='auto', cmap='viridis', interpolation='nearest')
+
+    ax.set_yticks(range(7))
+    ax.set_yticklabels(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+    ax.set_xticks(range(24))
+    ax.set_xticklabels([f'{hour:02}' for hour in range(24)], fontsize=8)
+    ax.set_xlabel('Hour of day')
+
+    # Label the busiest slot so the scale is readable without the colorbar
+    weekday, hour = divmod(int(grid.argmax()), 24)
+    ax.text(hour, weekday, f'{grid[weekday, hour]:.1f}', ha='center', va='center', color='white', fontsize=8)
+
+    fig.colorbar(image, ax=ax, label='Avg. users in voice')
+    ax.set_title(f'{guild_name} - Voice Activity by Hour (last {days} days)')
+    fig.tight_layout()
+
+    buffer = BytesIO()
+    fig.savefig(buffer, format='png')
+    plt.close('all')
+
+    return buffer.getvalue()
@@ -0,0 +1,168 @@
+# Standard library imports
+import functools
+import math
+import os
+import time
+
+# Local imports
+import config
+
+METRICS_HOST = getattr(config, 'METRICS_HOST', '127.0.0.1')
+METRICS_PORT = getattr(config, 'METRICS_PORT', None)  # None disables the endpoint
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+_registry = []
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        _registry.append(self)
+
+    def inc(self, *labelvalues, amount=1):
+        self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labelvalues, value in sorted(self._values.items()):
+            yield f'{self.name}{_labels(self.labelnames, labelvalues)} {_number(value)}'
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._values = {}
+        _registry.append(self)
+
+    def observe(self, value, *labelvalues):
+        series = self._values.get(labelvalues)
+        if series is None:
+            # Per-bucket counts followed by the sum
+            series = self._values[labelvalues] = [0] * len(self.buckets) + [0.0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[index] += 1
+                break
+        series[-1] += value
+
+    def collect(self):
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        for labelvalues, series in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                le = f'le="{_number(bound)}"'
+                yield f'{self.name}_bucket{_labels(self.labelnames, labelvalues, le)} {cumulative}'
+            labels = _labels(self.labelnames, labelvalues)
+            yield f'{self.name}_sum{labels} {_number(series[-1])}'
+            yield f'{self.name}_count{labels} {cumulative}'
+
+
+class Gauge:
+    """A value read from a callback at scrape time. Callbacks returning None are skipped."""
+
+    def __init__(self, name, help, callback):
+        self.name = name
+        self.help = help
+        self.callback = callback
+        _registry.append(self)
+
+    def collect(self):
+        value = self.callback()
+        if value is None:
+            return
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} gauge'
+        yield f'{self.name} {_number(value)}'
+
+
+def render():
+    """Every registered metric in the Prometheus text exposition format."""
+    lines = []
+    for metric in _registry:
+        try:
+            lines.extend(metric.collect())
+        except Exception as exc:
+            print(f'[Metrics] Could not collect {metric.name}: {exc}')
+    return '\n'.join(lines) + '\n'
+
+
+def resident_memory_bytes():
+    try:
+        with open('/proc/self/statm') as file:
+            return int(file.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+EVENTS = Counter('tle_events_total', 'Gateway events handled, by handler.', ('event',))
+EVENT_ERRORS = Counter('tle_event_errors_total', 'Event handlers that raised, by handler.', ('event',))
+EVENT_SECONDS = Histogram('tle_event_handler_seconds', 'Event handler run time.', ('event',))
+REST_SECONDS = Histogram('tle_discord_rest_seconds', 'Discord REST call latency, by method and route.', ('method', 'route'))
+STORAGE_SECONDS = Histogram('tle_storage_io_seconds', 'Storage call time in the I/O pool, including queueing.', ('operation',))
+Gauge('process_resident_memory_bytes', 'Resident memory size in bytes.', resident_memory_bytes)
+
+
+def instrument_http(bot):
+    """Time every Discord REST call made through the bot's HTTP client."""
+    request = bot.http.request
+    if getattr(request, '__wrapped__', None):
+        return
+
+    @functools.wraps(request)
+    async def timed_request(route, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await request(route, **kwargs)
+        finally:
+            REST_SECONDS.observe(time.perf_counter() - start, route.method, route.path)
+
+    bot.http.request = timed_request
+
+
+async def handle_metrics(request):
+    from aiohttp import web
+    return web.Response(text=render(), content_type='text/plain', charset='utf-8')
+
+
+async def start_server(host=None, port=None):
+    """Serve /metrics on host:port and return the runner, or None when disabled."""
+    port = METRICS_PORT if port is None else port
+    if port is None:
+        return None
+    from aiohttp import web
+
+    app = web.Application()
+    app.router.add_get('/metrics', handle_metrics)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host or METRICS_HOST, port)
+    await site.start()
+    print(f'Metrics available at http://{host or METRICS_HOST}:{port}/metrics')
+    return runner
@@ -0,0 +1,211 @@
+# Standard library imports
+import datetime
+import threading
+
+# Local imports
+from journal import voice_journal
+
+HOUR_MS = 3600 * 1000
+EPOCH = datetime.date(1970, 1, 1)
+CLOSE_GRACE = 15 * 60  # Seconds after midnight before a day is final; late flushes can still land in it
+
+# Voice seconds per (bucket, user, channel), sorted by bucket then user then
+# channel. Buckets are epoch days (server timezone) or epoch hours (UTC).
+ROLLUP_FIELDS = [('bucket', '<i8'), ('user', '<u8'), ('channel', '<u8'), ('seconds', '<f8')]
+
+
+def aggregate(buckets, users, channels, seconds):
+    """Sum seconds per (bucket, user, channel) into a sorted rollup array."""
+    import numpy as np
+
+    if len(buckets) == 0:
+        return np.zeros(0, dtype=ROLLUP_FIELDS)
+    order = np.lexsort((channels, users, buckets))
+    buckets, users, channels, seconds = buckets[order], users[order], channels[order], seconds[order]
+    starts = np.flatnonzero(np.concatenate((
+        [True], (buckets[1:] != buckets[:-1]) | (users[1:] != users[:-1]) | (channels[1:] != channels[:-1]))))
+    rollup = np.zeros(len(starts), dtype=ROLLUP_FIELDS)
+    rollup['bucket'] = buckets[starts]
+    rollup['user'] = users[starts]
+    rollup['channel'] = channels[starts]
+    rollup['seconds'] = np.add.reduceat(seconds, starts)
+    return rollup
+
+
+def split_hours(starts, ends):
+    """Split [start, end) millisecond intervals at hour boundaries.
+
+    Returns (interval index, epoch hour, milliseconds in that hour) for every
+    hour each interval touches, without a Python loop over intervals.
+    """
+    import numpy as np
+
+    first = starts // HOUR_MS
+    last = np.maximum(ends - 1, starts) // HOUR_MS
+    counts = last - first + 1
+    index = np.repeat(np.arange(len(starts)), counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    hours = first[index] + offsets
+    overlap = np.minimum(ends[index], (hours + 1) * HOUR_MS) - np.maximum(starts[index], hours * HOUR_MS)
+    return index, hours, np.maximum(overlap, 0)
+
+
+def daily_rollup(sessions):
+    return aggregate(sessions['day'].astype('<i8'), sessions['user'], sessions['channel'],
+                     (sessions['end'] - sessions['start']) / 1000.0)
+
+
+def hourly_rollup(sessions):
+    index, hours, milliseconds = split_hours(sessions['start'], sessions['end'])
+    return aggregate(hours, sessions['user'][index], sessions['channel'][index], milliseconds / 1000.0)
+
+
+def query(rollups, first_bucket, last_bucket, group_by, user_id=None, channel_id=None):
+    """Total seconds per user or channel over [first_bucket, last_bucket], largest first.
+
+    Accepts several sorted rollups (e.g. closed days plus today) so they never
+    need to be concatenated.
+    """
+    import numpy as np
+
+    parts = []
+    for rollup in rollups:
+        lo = np.searchsorted(rollup['bucket'], first_bucket, side='left')
+        hi = np.searchsorted(rollup['bucket'], last_bucket, side='right')
+        rows = rollup[lo:hi]
+        if user_id is not None:
+            rows = rows[rows['user'] == user_id]
+        if channel_id is not None:
+            rows = rows[rows['channel'] == channel_id]
+        parts.append(rows)
+    rows = np.concatenate(parts) if parts else np.zeros(0, dtype=ROLLUP_FIELDS)
+    if len(rows) == 0:
+        return []
+    keys, inverse = np.unique(rows[group_by], return_inverse=True)
+    totals = np.bincount(inverse, weights=rows['seconds'])
+    order = np.argsort(-totals)
+    return list(zip(keys[order].tolist(), totals[order].tolist()))
+
+
+def utc_offsets(seconds, timezone):
+    """The timezone's UTC offset in seconds at each epoch second.
+
+    Offsets come from the tzinfo itself, looked up once per distinct second,
+    which for hour buckets is at most one lookup per hour in the range.
+    """
+    import numpy as np
+
+    distinct, inverse = np.unique(seconds, return_inverse=True)
+    offsets = np.array([datetime.datetime.fromtimestamp(ts, timezone).utcoffset().total_seconds()
+                        for ts in distinct.tolist()])
+    return offsets[inverse]
+
+
+def hour_of_week(hourly_rollups, first_hour, last_hour, timezone):
+    """Average concurrent voice users for each local (weekday, hour), as a 7x24 array.
+
+    Seconds in voice are summed per hour bucket and divided by the number of
+    times each weekday/hour slot occurs in [first_hour, last_hour], so a slot
+    reads as the mean number of people in voice during that hour. Monday is
+    row 0.
+    """
+    import numpy as np
+
+    def slots(hours):
+        local = hours * 3600 + utc_offsets(hours * 3600, timezone).astype(np.int64)
+        weekday = (local // 86400 + 3) % 7  # 1970-01-01 was a Thursday
+        return weekday * 24 + (local // 3600) % 24
+
+    parts = []
+    for rollup in hourly_rollups:
+        lo = np.searchsorted(rollup['bucket'], first_hour, side='left')
+        hi = np.searchsorted(rollup['bucket'], last_hour, side='right')
+        parts.append(rollup[lo:hi])
+    rows = np.concatenate(parts) if parts else np.zeros(0, dtype=ROLLUP_FIELDS)
+
+    hours, inverse = np.unique(rows['bucket'], return_inverse=True)
+    seconds_per_hour = np.bincount(inverse, weights=rows['seconds'], minlength=len(hours))
+    seconds = np.bincount(slots(hours), weights=seconds_per_hour, minlength=7 * 24)
+    occurrences = np.bincount(slots(np.arange(first_hour, last_hour + 1, dtype=np.int64)), minlength=7 * 24)
+    return (seconds / np.maximum(occurrences, 1) / 3600.0).reshape(7, 24)
+
+
+class _GuildRollups:
+    __slots__ = ('closed_through', 'daily', 'hourly')
+
+    def __init__(self):
+        import numpy as np
+
+        self.closed_through = None  # Last day folded into the arrays
+        self.daily = np.zeros(0, dtype=ROLLUP_FIELDS)
+        self.hourly = np.zeros(0, dtype=ROLLUP_FIELDS)
+
+
+class RollupEngine:
+    """Hourly and daily voice rollups per guild, user and channel.
+
+    Past days never change, so they are aggregated once from the journal and
+    extended as days close. Days that are still open (today, and yesterday
+    shortly after midnight) are aggregated on each query from their raw
+    segments, which are small. Only counted (non-AFK) time is included.
+    """
+
+    def __init__(self, journal=voice_journal):
+        self.journal = journal
+        self._guilds = {}
+        self._lock = threading.Lock()
+
+    def _today(self):
+        return self.journal.day_of(self.journal.now())
+
+    def _refresh(self, guild_id):
+        import numpy as np
+
+        guild = self._guilds.get(guild_id)
+        if guild is None:
+            guild = self._guilds[guild_id] = _GuildRollups()
+        closed_through = self.journal.day_of(self.journal.now() - CLOSE_GRACE) - datetime.timedelta(days=1)
+        if guild.closed_through is None or guild.closed_through < closed_through:
+            first_day = None if guild.closed_through is None else guild.closed_through + datetime.timedelta(days=1)
+            sessions = self.journal.load_sessions(guild_id, first_day, closed_through)
+            sessions = sessions[sessions['counted'] == 1]
+            # New days sort after everything already aggregated
+            guild.daily = np.concatenate((guild.daily, daily_rollup(sessions)))
+            guild.hourly = np.concatenate((guild.hourly, hourly_rollup(sessions)))
+            guild.closed_through = closed_through
+        return guild
+
+    def rollups(self, guild_id):
+        """([daily rollups], [hourly rollups]) covering closed days and the days still open."""
+        with self._lock:
+            guild = self._refresh(guild_id)
+            closed_through = guild.closed_through
+            daily, hourly = guild.daily, guild.hourly
+        recent = self.journal.load_sessions(guild_id, closed_through + datetime.timedelta(days=1))
+        recent = recent[recent['counted'] == 1]
+        return [daily, daily_rollup(recent)], [hourly, hourly_rollup(recent)]
+
+    def by_day(self, guild_id, days, group_by, user_id=None, channel_id=None):
+        """Seconds per user or channel over the last `days` days, including today."""
+        last_day = (self._today() - EPOCH).days
+        daily, _ = self.rollups(guild_id)
+        return query(daily, last_day - days + 1, last_day, group_by, user_id, channel_id)
+
+    def by_hour(self, guild_id, hours, group_by, user_id=None, channel_id=None):
+        """Seconds per user or channel over the last `hours` hours."""
+        last_hour = int(self.journal.now() * 1000) // HOUR_MS
+        _, hourly = self.rollups(guild_id)
+        return query(hourly, last_hour - hours + 1, last_hour, group_by, user_id, channel_id)
+
+    def heatmap(self, guild_id, days):
+        """hour_of_week() over the last `days` days."""
+        last_hour = int(self.journal.now() * 1000) // HOUR_MS
+        _, hourly = self.rollups(guild_id)
+        return hour_of_week(hourly, last_hour - days * 24 + 1, last_hour, self.journal.timezone)
+
+    def drop(self, guild_id):
+        with self._lock:
+            self._guilds.pop(guild_id, None)
+
+
+rollup_engine = RollupEngine()
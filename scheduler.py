@@ -0,0 +1,133 @@
+# Standard library imports
+import asyncio
+import datetime
+import time
+
+# Third-party library imports
+import pytz
+
+# Local imports
+import config
+
+MAX_SLEEP = 300  # Seconds slept at a time before the clock is checked again
+
+
+class Job:
+    __slots__ = ('name', 'at', 'weekdays', 'coro', 'grace', 'last_run')
+
+    def __init__(self, name, at, weekdays, coro, grace):
+        self.name = name
+        self.at = at
+        self.weekdays = weekdays
+        self.coro = coro
+        self.grace = grace
+        self.last_run = None  # Epoch seconds of the last occurrence that ran
+
+
+class Scheduler:
+    """Runs coroutines at fixed local times of day in the server timezone.
+
+    Each job remembers the last scheduled occurrence it ran, persisted
+    through save_state, so a restart neither repeats nor loses a run: an
+    occurrence missed while the bot was down runs once on startup if it is
+    no more than `grace` seconds late. The next run is recomputed from the
+    wall clock after every run and every MAX_SLEEP seconds of waiting, so
+    the schedule cannot drift and follows DST changes.
+    """
+
+    def __init__(self, timezone=None, clock=time.time, sleep=asyncio.sleep, load_state=None, save_state=None):
+        self.timezone = pytz.timezone(timezone or config.SERVER_TIMEZONE)
+        self._clock = clock
+        self._sleep = sleep
+        self._load_state = load_state
+        self._save_state = save_state
+        self._jobs = {}
+        self._tasks = {}
+
+    def register(self, name, at, coro, weekdays=None, grace=None):
+        """Run coro() every day at the local time `at`, or only on `weekdays` (Monday is 0).
+
+        grace is how late, in seconds, a missed run may still be made up on
+        startup; None always makes it up and 0 never does.
+        """
+        if name in self._jobs:
+            raise ValueError(f'Job {name} is already registered')
+        self._jobs[name] = Job(name, at, frozenset(weekdays) if weekdays is not None else None, coro, grace)
+
+    def _local_time(self, day, at):
+        # A time skipped by DST runs an hour later; a time that occurs twice runs once, the second time
+        return self.timezone.normalize(self.timezone.localize(datetime.datetime.combine(day, at), is_dst=False))
+
+    def _occurrences(self, job, around):
+        day = datetime.datetime.fromtimestamp(around, self.timezone).date()
+        for offset in range(-8, 9):
+            candidate = day + datetime.timedelta(days=offset)
+            if job.weekdays is None or candidate.weekday() in job.weekdays:
+                yield self._local_time(candidate, job.at).timestamp()
+
+    def next_run(self, job, after):
+        """First occurrence strictly after the epoch time `after`."""
+        return min(ts for ts in self._occurrences(job, after) if ts > after)
+
+    def previous_run(self, job, now):
+        """Last occurrence at or before the epoch time `now`."""
+        return max(ts for ts in self._occurrences(job, now) if ts <= now)
+
+    def start(self):
+        """Start every registered job. Safe to call again (e.g. on reconnect); running jobs are left alone."""
+        for name, job in self._jobs.items():
+            if name not in self._tasks or self._tasks[name].done():
+                self._tasks[name] = asyncio.create_task(self._run_job(job), name=f'scheduler:{name}')
+
+    async def _state(self):
+        if self._load_state is None:
+            return {}
+        return await self._load_state() or {}
+
+    async def _run_job(self, job):
+        if job.last_run is None:
+            job.last_run = (await self._state()).get(job.name)
+        now = self._clock()
+        missed = self.previous_run(job, now)
+        if job.last_run is None or job.last_run >= missed:
+            # First run ever, or nothing missed: start from the next occurrence
+            job.last_run = max(job.last_run or 0, missed)
+        elif job.grace is not None and now - missed > job.grace:
+            print(f'[Scheduler] Skipping missed {job.name} run from {self.describe(missed)}')
+            job.last_run = missed
+        else:
+            print(f'[Scheduler] Catching up missed {job.name} run from {self.describe(missed)}')
+
+        while True:
+            due = self.next_run(job, job.last_run)
+            now = self._clock()
+            if due > now:
+                print(f'[Scheduler] Next {job.name} run at {self.describe(due)}')
+            while due > now:
+                await self._sleep(min(due - now, MAX_SLEEP))
+                now = self._clock()
+                # The wall clock may have jumped (e.g. after a suspend); skip occurrences that can no
+                # longer run on time. Sleeps always end a little late, so only a gap longer than a
+                # whole sleep counts as a jump, even for jobs with no grace.
+                if job.grace is not None and now - due > max(job.grace, MAX_SLEEP):
+                    job.last_run = self.previous_run(job, now)
+                    due = self.next_run(job, job.last_run)
+
+            try:
+                await job.coro()
+            except Exception as exc:
+                print(f'[Scheduler] {job.name} failed: {type(exc).__name__}: {exc}')
+            job.last_run = max(due, self.previous_run(job, self._clock()))
+            await self._persist()
+
+    async def _persist(self):
+        if self._save_state is None:
+            return
+        state = {job.name: job.last_run for job in self._jobs.values() if job.last_run is not None}
+        try:
+            await self._save_state(state)
+        except Exception as exc:
+            print(f'[Scheduler] Could not save the schedule: {type(exc).__name__}: {exc}')
+
+    def describe(self, ts):
+        return datetime.datetime.fromtimestamp(ts, self.timezone).strftime('%Y-%m-%d %H:%M %Z')
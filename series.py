@@ -0,0 +1,107 @@
+# Standard library imports
+import csv
+import os
+
+# Third-party library imports
+import numpy as np
+
+# Daily report history as fixed-width little-endian records:
+# epoch day, unique users, voice minutes (-1 when not recorded).
+MAGIC = b'TLEDAILY\x01\x00\x00\x00\x00\x00\x00\x00'
+HEADER_SIZE = len(MAGIC)
+RECORD_DTYPE = np.dtype([('day', '<i4'), ('unique_users', '<i4'), ('voice_minutes', '<i4')])
+NO_MINUTES = -1
+
+
+def empty():
+    return np.zeros(0, dtype=RECORD_DTYPE)
+
+
+def make_records(rows):
+    """Build a record array from (date, unique_users, voice_minutes_or_None) rows."""
+    records = np.zeros(len(rows), dtype=RECORD_DTYPE)
+    if rows:
+        dates, unique_users, voice_minutes = zip(*rows)
+        records['day'] = np.array([str(day)[:10] for day in dates], dtype='datetime64[D]').astype(np.int64)
+        records['unique_users'] = unique_users
+        records['voice_minutes'] = [NO_MINUTES if minutes is None else minutes for minutes in voice_minutes]
+    return records
+
+
+def to_rows(records):
+    """Convert records back to (date, unique_users, voice_minutes_or_None) rows."""
+    dates = records['day'].astype('datetime64[D]').astype(str).tolist()
+    return [(day, unique_users, None if voice_minutes == NO_MINUTES else voice_minutes)
+            for day, unique_users, voice_minutes
+            in zip(dates, records['unique_users'].tolist(), records['voice_minutes'].tolist())]
+
+
+def open_series(path, magic=MAGIC, dtype=RECORD_DTYPE):
+    """Map a record file read-only. Slicing the result does not copy.
+
+    magic and dtype default to the daily report series; the voice journal
+    keeps its files in the same layout with its own header and records.
+    """
+    if not os.path.exists(path) or os.path.getsize(path) <= len(magic):
+        return np.zeros(0, dtype=dtype)
+
+    with open(path, 'rb') as file:
+        if file.read(len(magic)) != magic:
+            raise ValueError(f'{path} is not a {magic[:8].decode()} file')
+
+    # Ignore a trailing partial record left by an interrupted append
+    count = (os.path.getsize(path) - len(magic)) // np.dtype(dtype).itemsize
+    return np.memmap(path, dtype=dtype, mode='r', offset=len(magic), shape=(count,))
+
+
+def tail(path, count):
+    records = open_series(path)
+    return records[max(len(records) - count, 0):]
+
+
+def append(path, records, magic=MAGIC, dtype=RECORD_DTYPE, sync=False):
+    """Append records to a record file, writing the header first if it is new. sync fsyncs before returning."""
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    records = np.asarray(records, dtype=dtype)
+    with open(path, 'ab') as file:
+        if file.tell() == 0:
+            file.write(magic)
+        else:
+            # Drop a partial record from an interrupted append before writing
+            size = file.tell()
+            extra = (size - len(magic)) % records.dtype.itemsize
+            if extra:
+                file.truncate(size - extra)
+                file.seek(size - extra)
+        file.write(records.tobytes())
+        if sync:
+            file.flush()
+            os.fsync(file.fileno())
+
+
+def write(path, records):
+    """Atomically replace the series file with `records`."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'wb') as file:
+        file.write(MAGIC)
+        file.write(np.asarray(records, dtype=RECORD_DTYPE).tobytes())
+    os.replace(temp_path, path)
+
+
+def read_legacy_csv(csv_path):
+    """Parse a 2- or 3-column daily_report_data.csv into records."""
+    rows = []
+    with open(csv_path, 'r', newline='') as file:
+        for row in csv.reader(file):
+            if len(row) < 2:
+                continue
+            minutes = int(row[2]) if len(row) > 2 and row[2] != '' else None
+            rows.append((row[0], int(row[1]), minutes))
+    return make_records(rows)
+
+
+def convert_csv(csv_path, series_path):
+    """Convert a legacy CSV history to the binary format. Returns the record count."""
+    records = read_legacy_csv(csv_path)
+    write(series_path, records)
+    return len(records)
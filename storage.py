@@ -0,0 +1,639 @@
+# Standard library imports
+import functools
+import os
+from abc import ABC, abstractmethod
+import sqlite3
+import sys
+import threading
+
+# Third-party library imports
+import yaml
+
+# Local imports
+import config
+
+GUILDS_DIR = 'guilds'
+DB_PATH = f'{GUILDS_DIR}/guild_data.db'
+DEFAULT_BACKEND = 'sqlite'
+
+
+def _series():
+    """The series module, imported on first use because it pulls in numpy."""
+    import series
+    return series
+
+
+class Storage(ABC):
+    """Interface for persisting per-guild data.
+
+    Guild ids may be passed as int or str. Daily report rows are returned as
+    (date, unique_users, total_voice_minutes) tuples where total_voice_minutes
+    is None for rows recorded before minutes were tracked.
+    """
+
+    name = None
+
+    @abstractmethod
+    def load_config(self, guild_id):
+        """Return the guild's config dict, or None if it has none."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_config(self, guild_id, config):
+        raise NotImplementedError
+
+    @abstractmethod
+    def config_stamp(self, guild_id):
+        """Return a value that changes whenever the config is changed out-of-band.
+
+        Cached configs are reloaded when the stamp changes, so edits made
+        outside the bot are picked up on the next load.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def get_last_seen(self, guild_id, user_id):
+        """Return the user's last seen timestamp string, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def set_last_seen(self, guild_id, user_id, seen):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_all_last_seen(self, guild_id):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_voice_activity(self, guild_id):
+        """Return the set of user ids seen in voice today."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_voice_activity(self, guild_id, user_ids):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_voice_minutes(self):
+        """Return {guild_id: minutes} for every guild with recorded minutes."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_voice_minutes(self, guild_id, minutes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def clear_voice_minutes(self):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_voice_sessions(self):
+        """Return the last voice session checkpoint, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_voice_sessions(self, checkpoint):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_schedule(self):
+        """Return {job name: epoch seconds of its last run}, or None."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def save_schedule(self, last_runs):
+        raise NotImplementedError
+
+    @abstractmethod
+    def append_daily_report(self, guild_id, date, unique_users, total_voice_minutes):
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_daily_report(self, guild_id, limit=None):
+        """Return the guild's daily report rows, or only the last `limit` rows."""
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_daily_series(self, guild_id, limit=None):
+        """Return daily report history as a series.RECORD_DTYPE array.
+
+        With `limit`, only the last `limit` records are read.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def load_daily_report_summary(self, guild_id):
+        """Return all-time aggregates of the daily report history.
+
+        The summary is a dict with 'rows', 'max_unique_users' and
+        'max_unique_users_date', kept up to date on every append.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def guild_ids(self):
+        """Return the ids of all guilds with stored data."""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _locked(method):
+    """Serialize a backend method on the instance's _lock."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+class YamlStorage(Storage):
+    """The original guilds/<id>/*.yml and daily_report_data.csv layout."""
+
+    name = 'yaml'
+
+    def __init__(self, root=GUILDS_DIR):
+        self.root = root
+        # Storage calls run on the I/O pool; files are read-modify-written in place
+        self._lock = threading.RLock()
+
+    def _path(self, guild_id, file_name):
+        return f'{self.root}/{guild_id}/{file_name}'
+
+    def _read_yaml(self, path):
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r') as file:
+            return yaml.safe_load(file)
+
+    def _write_yaml(self, path, data):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as file:
+            yaml.safe_dump(data, file)
+
+    @_locked
+    def load_config(self, guild_id):
+        return self._read_yaml(self._path(guild_id, 'config.yml'))
+
+    @_locked
+    def save_config(self, guild_id, config):
+        self._write_yaml(self._path(guild_id, 'config.yml'), config)
+
+    @_locked
+    def config_stamp(self, guild_id):
+        try:
+            return os.stat(self._path(guild_id, 'config.yml')).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    @_locked
+    def get_last_seen(self, guild_id, user_id):
+        seen_data = self._read_yaml(self._path(guild_id, 'users_seen.yml')) or {}
+        return seen_data.get(int(user_id))
+
+    @_locked
+    def set_last_seen(self, guild_id, user_id, seen):
+        seen_path = self._path(guild_id, 'users_seen.yml')
+        seen_data = self._read_yaml(seen_path) or {}
+        seen_data[int(user_id)] = seen
+        self._write_yaml(seen_path, seen_data)
+
+    @_locked
+    def load_all_last_seen(self, guild_id):
+        seen_data = self._read_yaml(self._path(guild_id, 'users_seen.yml')) or {}
+        return {int(user_id): str(seen) for user_id, seen in seen_data.items()}
+
+    @_locked
+    def load_voice_activity(self, guild_id):
+        return set(self._read_yaml(self._path(guild_id, 'voice_activity.yml')) or [])
+
+    @_locked
+    def save_voice_activity(self, guild_id, user_ids):
+        self._write_yaml(self._path(guild_id, 'voice_activity.yml'), sorted(user_ids))
+
+    @_locked
+    def load_voice_minutes(self):
+        voice_minutes = {}
+        for guild_id in self.guild_ids():
+            data = self._read_yaml(self._path(guild_id, 'voice_minutes.yml'))
+            if data is not None:
+                voice_minutes[guild_id] = data.get('voice_minutes', 0)
+        return voice_minutes
+
+    @_locked
+    def save_voice_minutes(self, guild_id, minutes):
+        self._write_yaml(self._path(guild_id, 'voice_minutes.yml'), {'voice_minutes': minutes})
+
+    @_locked
+    def clear_voice_minutes(self):
+        for guild_id in self.guild_ids():
+            if os.path.exists(self._path(guild_id, 'voice_minutes.yml')):
+                self.save_voice_minutes(guild_id, 0)
+
+    @_locked
+    def load_voice_sessions(self):
+        return self._read_yaml(f'{self.root}/voice_sessions.yml')
+
+    @_locked
+    def save_voice_sessions(self, checkpoint):
+        # Write to a temporary file first so a crash never leaves a torn checkpoint
+        path = f'{self.root}/voice_sessions.yml'
+        self._write_yaml(path + '.tmp', checkpoint)
+        os.replace(path + '.tmp', path)
+
+    @_locked
+    def load_schedule(self):
+        return self._read_yaml(f'{self.root}/schedule.yml')
+
+    @_locked
+    def save_schedule(self, last_runs):
+        path = f'{self.root}/schedule.yml'
+        self._write_yaml(path + '.tmp', last_runs)
+        os.replace(path + '.tmp', path)
+
+    def _series_path(self, guild_id):
+        """Return the guild's daily_report.bin, converting a legacy CSV history once."""
+        series_path = self._path(guild_id, 'daily_report.bin')
+        csv_path = self._path(guild_id, 'daily_report_data.csv')
+        if os.path.exists(csv_path) and not os.path.exists(series_path):
+            count = _series().convert_csv(csv_path, series_path)
+            os.replace(csv_path, csv_path + '.migrated')
+            print(f'Converted {count} daily report rows for guild {guild_id}')
+        return series_path
+
+    @_locked
+    def append_daily_report(self, guild_id, date, unique_users, total_voice_minutes):
+        # Bring the summary up to date before the new record lands in the file
+        summary = self.load_daily_report_summary(guild_id)
+
+        series = _series()
+        series.append(self._series_path(guild_id), series.make_records([(date, unique_users, total_voice_minutes)]))
+
+        self._write_yaml(self._path(guild_id, 'daily_report_summary.yml'),
+                         _update_summary(summary, str(date), unique_users))
+
+    @_locked
+    def load_daily_report(self, guild_id, limit=None):
+        return _series().to_rows(self.load_daily_series(guild_id, limit))
+
+    @_locked
+    def load_daily_series(self, guild_id, limit=None):
+        return _read_series(self._series_path(guild_id), limit)
+
+    @_locked
+    def load_daily_report_summary(self, guild_id):
+        summary_path = self._path(guild_id, 'daily_report_summary.yml')
+        summary = self._read_yaml(summary_path)
+        if summary is None:
+            # Build the sidecar once from the full history; appends keep it current
+            records = self.load_daily_series(guild_id)
+            summary = _summarize(records)
+            if len(records):
+                self._write_yaml(summary_path, summary)
+        return summary
+
+    @_locked
+    def guild_ids(self):
+        if not os.path.isdir(self.root):
+            return []
+        return [int(name) for name in os.listdir(self.root)
+                if name.isdigit() and os.path.isdir(f'{self.root}/{name}')]
+
+
+def _read_series(series_path, limit):
+    if limit is not None:
+        return _series().tail(series_path, limit)
+    return _series().open_series(series_path)
+
+
+def _summarize(records):
+    summary = _update_summary(None, None, None)
+    if len(records):
+        # argmax returns the first maximum, matching the earliest-date tie rule
+        best = int(records['unique_users'].argmax())
+        summary['rows'] = len(records)
+        summary['max_unique_users'] = int(records['unique_users'][best])
+        summary['max_unique_users_date'] = _series().to_rows(records[best:best + 1])[0][0]
+    return summary
+
+
+def _update_summary(summary, date, unique_users):
+    if summary is None:
+        summary = {'rows': 0, 'max_unique_users': None, 'max_unique_users_date': None}
+    if date is None:
+        return summary
+
+    summary = dict(summary)
+    summary['rows'] += 1
+    # Ties keep the earliest date
+    if summary['max_unique_users'] is None or unique_users > summary['max_unique_users']:
+        summary['max_unique_users'] = unique_users
+        summary['max_unique_users_date'] = str(date)
+    return summary
+
+
+# Statements are kept as constants so sqlite3's statement cache reuses the
+# prepared form on every call.
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS meta ('
+    'key TEXT PRIMARY KEY, value TEXT NOT NULL) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS config ('
+    'guild_id INTEGER PRIMARY KEY, data TEXT NOT NULL)',
+    'CREATE TABLE IF NOT EXISTS last_seen ('
+    'guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, seen TEXT NOT NULL, '
+    'PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS voice_activity ('
+    'guild_id INTEGER NOT NULL, user_id INTEGER NOT NULL, '
+    'PRIMARY KEY (guild_id, user_id)) WITHOUT ROWID',
+    'CREATE TABLE IF NOT EXISTS voice_minutes ('
+    'guild_id INTEGER PRIMARY KEY, minutes INTEGER NOT NULL)',
+    # History written before it moved to daily_report.bin; _series_path moves it out once
+    'CREATE TABLE IF NOT EXISTS daily_report ('
+    'id INTEGER PRIMARY KEY AUTOINCREMENT, guild_id INTEGER NOT NULL, date TEXT NOT NULL, '
+    'unique_users INTEGER NOT NULL, total_voice_minutes INTEGER)',
+    'CREATE INDEX IF NOT EXISTS daily_report_guild ON daily_report (guild_id, id)',
+    'CREATE TABLE IF NOT EXISTS daily_report_summary ('
+    'guild_id INTEGER PRIMARY KEY, rows INTEGER NOT NULL, '
+    'max_unique_users INTEGER, max_unique_users_date TEXT)',
+)
+_SELECT_CONFIG = 'SELECT data FROM config WHERE guild_id = ?'
+_UPSERT_CONFIG = 'INSERT OR REPLACE INTO config (guild_id, data) VALUES (?, ?)'
+_SELECT_LAST_SEEN = 'SELECT seen FROM last_seen WHERE guild_id = ? AND user_id = ?'
+_SELECT_ALL_LAST_SEEN = 'SELECT user_id, seen FROM last_seen WHERE guild_id = ?'
+_UPSERT_LAST_SEEN = 'INSERT OR REPLACE INTO last_seen (guild_id, user_id, seen) VALUES (?, ?, ?)'
+_IMPORT_LAST_SEEN = 'INSERT OR IGNORE INTO last_seen (guild_id, user_id, seen) VALUES (?, ?, ?)'
+_SELECT_VOICE_ACTIVITY = 'SELECT user_id FROM voice_activity WHERE guild_id = ?'
+_DELETE_VOICE_ACTIVITY = 'DELETE FROM voice_activity WHERE guild_id = ?'
+_INSERT_VOICE_ACTIVITY = 'INSERT OR IGNORE INTO voice_activity (guild_id, user_id) VALUES (?, ?)'
+_SELECT_VOICE_MINUTES = 'SELECT guild_id, minutes FROM voice_minutes'
+_UPSERT_VOICE_MINUTES = 'INSERT OR REPLACE INTO voice_minutes (guild_id, minutes) VALUES (?, ?)'
+_CLEAR_VOICE_MINUTES = 'UPDATE voice_minutes SET minutes = 0'
+_SELECT_DAILY_REPORT = ('SELECT date, unique_users, total_voice_minutes FROM daily_report '
+                        'WHERE guild_id = ? ORDER BY id')
+_DELETE_DAILY_REPORT = 'DELETE FROM daily_report WHERE guild_id = ?'
+_SELECT_SUMMARY = ('SELECT rows, max_unique_users, max_unique_users_date FROM daily_report_summary '
+                   'WHERE guild_id = ?')
+_DELETE_SUMMARY = 'DELETE FROM daily_report_summary WHERE guild_id = ?'
+_UPSERT_SUMMARY = ('INSERT OR REPLACE INTO daily_report_summary '
+                   '(guild_id, rows, max_unique_users, max_unique_users_date) VALUES (?, ?, ?, ?)')
+_SELECT_GUILD_IDS = ('SELECT guild_id FROM config UNION SELECT guild_id FROM last_seen '
+                     'UNION SELECT guild_id FROM voice_activity UNION SELECT guild_id FROM voice_minutes '
+                     'UNION SELECT guild_id FROM daily_report')
+
+
+class SQLiteStorage(Storage):
+    """All guild data in a single SQLite database running in WAL mode.
+
+    Daily report history is the exception: like the YAML backend it lives in
+    fixed-width guilds/<id>/daily_report.bin files next to the database, so
+    plots map just the records they need instead of selecting rows.
+    """
+
+    name = 'sqlite'
+
+    def __init__(self, path=DB_PATH):
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        self.root = os.path.dirname(path) or '.'
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None,
+                                     cached_statements=64)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        for statement in _SCHEMA:
+            self._conn.execute(statement)
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _transaction(self, statements):
+        """Run [(sql, params_or_rows, many)] atomically."""
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                for sql, params, many in statements:
+                    if many:
+                        self._conn.executemany(sql, params)
+                    else:
+                        self._conn.execute(sql, params)
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+
+    def load_config(self, guild_id):
+        rows = self._query(_SELECT_CONFIG, (int(guild_id),))
+        return yaml.safe_load(rows[0][0]) if rows else None
+
+    def save_config(self, guild_id, config):
+        self._query(_UPSERT_CONFIG, (int(guild_id), yaml.safe_dump(config)))
+
+    def config_stamp(self, guild_id):
+        # data_version changes whenever another connection commits to the database, so an edit
+        # made with the sqlite3 shell reloads every guild's config. guilds/<id>/config.yml is
+        # only read by the one-time legacy import; editing it has no effect on this backend.
+        return self._query('PRAGMA data_version')[0][0]
+
+    def get_last_seen(self, guild_id, user_id):
+        rows = self._query(_SELECT_LAST_SEEN, (int(guild_id), int(user_id)))
+        return rows[0][0] if rows else None
+
+    def set_last_seen(self, guild_id, user_id, seen):
+        self._query(_UPSERT_LAST_SEEN, (int(guild_id), int(user_id), seen))
+
+    def load_all_last_seen(self, guild_id):
+        return dict(self._query(_SELECT_ALL_LAST_SEEN, (int(guild_id),)))
+
+    def load_voice_activity(self, guild_id):
+        return {row[0] for row in self._query(_SELECT_VOICE_ACTIVITY, (int(guild_id),))}
+
+    def save_voice_activity(self, guild_id, user_ids):
+        guild_id = int(guild_id)
+        self._transaction([
+            (_DELETE_VOICE_ACTIVITY, (guild_id,), False),
+            (_INSERT_VOICE_ACTIVITY, [(guild_id, int(user_id)) for user_id in user_ids], True),
+        ])
+
+    def load_voice_minutes(self):
+        return dict(self._query(_SELECT_VOICE_MINUTES))
+
+    def save_voice_minutes(self, guild_id, minutes):
+        self._query(_UPSERT_VOICE_MINUTES, (int(guild_id), minutes))
+
+    def clear_voice_minutes(self):
+        self._query(_CLEAR_VOICE_MINUTES)
+
+    def load_voice_sessions(self):
+        checkpoint = self.get_meta('voice_sessions')
+        return yaml.safe_load(checkpoint) if checkpoint is not None else None
+
+    def save_voice_sessions(self, checkpoint):
+        self.set_meta('voice_sessions', yaml.safe_dump(checkpoint))
+
+    def load_schedule(self):
+        last_runs = self.get_meta('schedule')
+        return yaml.safe_load(last_runs) if last_runs is not None else None
+
+    def save_schedule(self, last_runs):
+        self.set_meta('schedule', yaml.safe_dump(last_runs))
+
+    def _series_path(self, guild_id):
+        """Return the guild's daily_report.bin, moving history out of the daily_report table once."""
+        guild_id = int(guild_id)
+        series_path = f'{self.root}/{guild_id}/daily_report.bin'
+        if not os.path.exists(series_path):
+            with self._lock:
+                rows = self._query(_SELECT_DAILY_REPORT, (guild_id,))
+                if rows:
+                    os.makedirs(os.path.dirname(series_path), exist_ok=True)
+                    series = _series()
+                    series.write(series_path, series.make_records(rows))
+                    self._query(_DELETE_DAILY_REPORT, (guild_id,))
+                    print(f'Moved {len(rows)} daily report rows for guild {guild_id} to {series_path}')
+        return series_path
+
+    def append_daily_report(self, guild_id, date, unique_users, total_voice_minutes):
+        guild_id = int(guild_id)
+        with self._lock:
+            summary = _update_summary(self.load_daily_report_summary(guild_id), str(date), unique_users)
+            series = _series()
+            series.append(self._series_path(guild_id), series.make_records([(date, unique_users, total_voice_minutes)]))
+            self._query(_UPSERT_SUMMARY, self._summary_params(guild_id, summary))
+
+    def load_daily_report(self, guild_id, limit=None):
+        return _series().to_rows(self.load_daily_series(guild_id, limit))
+
+    def load_daily_series(self, guild_id, limit=None):
+        return _read_series(self._series_path(guild_id), limit)
+
+    def load_daily_report_summary(self, guild_id):
+        guild_id = int(guild_id)
+        with self._lock:
+            records = self.load_daily_series(guild_id)
+            rows = self._query(_SELECT_SUMMARY, (guild_id,))
+            # The series file and the summary row are written separately; rebuild if a crash split them
+            if rows and rows[0][0] == len(records):
+                count, max_unique_users, max_unique_users_date = rows[0]
+                return {'rows': count, 'max_unique_users': max_unique_users,
+                        'max_unique_users_date': max_unique_users_date}
+
+            # Build the summary once from the full history; appends keep it current
+            summary = _summarize(records)
+            if summary['rows']:
+                self._query(_UPSERT_SUMMARY, self._summary_params(guild_id, summary))
+            return summary
+
+    @staticmethod
+    def _summary_params(guild_id, summary):
+        return (guild_id, summary['rows'], summary['max_unique_users'], summary['max_unique_users_date'])
+
+    def guild_ids(self):
+        guild_ids = {row[0] for row in self._query(_SELECT_GUILD_IDS)}
+        if os.path.isdir(self.root):
+            guild_ids.update(int(name) for name in os.listdir(self.root)
+                             if name.isdigit() and os.path.exists(f'{self.root}/{name}/daily_report.bin'))
+        return sorted(guild_ids)
+
+    def get_meta(self, key):
+        rows = self._query('SELECT value FROM meta WHERE key = ?', (key,))
+        return rows[0][0] if rows else None
+
+    def set_meta(self, key, value):
+        self._query('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', (key, str(value)))
+
+    def import_guild(self, source, guild_id, voice_minutes=None):
+        """Copy one guild's data from another backend in a single transaction.
+
+        Existing last seen entries and daily report history are kept; the
+        source only fills in what is missing. voice_minutes is the source's
+        load_voice_minutes(), to avoid reading it once per guild.
+        """
+        guild_id = int(guild_id)
+        statements = []
+
+        config = source.load_config(guild_id)
+        if config is not None and self.load_config(guild_id) is None:
+            statements.append((_UPSERT_CONFIG, (guild_id, yaml.safe_dump(config)), False))
+
+        last_seen = source.load_all_last_seen(guild_id)
+        statements.append((_IMPORT_LAST_SEEN,
+                           [(guild_id, user_id, seen) for user_id, seen in last_seen.items()], True))
+
+        voice_activity = source.load_voice_activity(guild_id)
+        statements.append((_INSERT_VOICE_ACTIVITY,
+                           [(guild_id, int(user_id)) for user_id in voice_activity], True))
+
+        if voice_minutes is None:
+            voice_minutes = source.load_voice_minutes()
+        minutes = voice_minutes.get(guild_id)
+        if minutes is not None:
+            statements.append((_UPSERT_VOICE_MINUTES, (guild_id, minutes), False))
+
+        self._transaction(statements)
+
+        # A YAML source in the same directory already wrote the series file this backend reads
+        daily_series = source.load_daily_series(guild_id)
+        imported_rows = 0
+        with self._lock:
+            if len(daily_series) and not len(self.load_daily_series(guild_id)):
+                series_path = self._series_path(guild_id)
+                os.makedirs(os.path.dirname(series_path), exist_ok=True)
+                _series().write(series_path, daily_series)
+                self._query(_DELETE_SUMMARY, (guild_id,))
+                imported_rows = len(daily_series)
+        return len(last_seen), imported_rows
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def import_legacy(source=None, dest=None):
+    """Migrate every guild from the YAML/CSV layout into the SQLite backend."""
+    source = source or YamlStorage()
+    dest = dest or SQLiteStorage()
+
+    voice_minutes = source.load_voice_minutes()
+    for guild_id in source.guild_ids():
+        last_seen_count, report_count = dest.import_guild(source, guild_id, voice_minutes)
+        print(f'Imported guild {guild_id}: {last_seen_count} last seen entries, {report_count} daily report rows')
+
+    dest.set_meta('legacy_imported', 1)
+    return dest
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage():
+    """Return the configured backend, importing legacy data on first SQLite use."""
+    global _storage
+    if _storage is not None:
+        return _storage
+    with _storage_lock:
+        # Several I/O pool threads can ask for the backend before it exists
+        if _storage is not None:
+            return _storage
+        backend = getattr(config, 'STORAGE_BACKEND', DEFAULT_BACKEND)
+        if backend == 'yaml':
+            storage = YamlStorage()
+        elif backend == 'sqlite':
+            storage = SQLiteStorage()
+            if storage.get_meta('legacy_imported') is None:
+                import_legacy(dest=storage)
+        else:
+            raise ValueError(f'Unknown storage backend: {backend}')
+        # Published only once the import is done, so no caller sees a half-imported database
+        _storage = storage
+    return _storage
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2 or sys.argv[1] != 'import':
+        print(f'Usage: {sys.argv[0]} import [database path]')
+        sys.exit(1)
+
+    db_path = sys.argv[2] if len(sys.argv) > 2 else DB_PATH
+    import_legacy(dest=SQLiteStorage(db_path)).close()
@@ -0,0 +1,83 @@
+# Standard library imports
+import datetime
+import os
+import sys
+import tempfile
+import types
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if 'config' not in sys.modules:
+    config = types.ModuleType('config')
+    config.SERVER_TIMEZONE = 'UTC'
+    sys.modules['config'] = config
+
+# Local imports
+import journal
+
+CHANNEL = types.SimpleNamespace(id=9)
+USER = 5
+
+
+def at(day, hour, minute=0):
+    return datetime.datetime(2024, 10, day, hour, minute, tzinfo=datetime.timezone.utc).timestamp()
+
+
+class JournalTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.TemporaryDirectory()
+        self.now = 0
+        self.journal = journal.VoiceJournal(root=self.root.name, timezone='UTC', clock=lambda: self.now)
+
+    def tearDown(self):
+        self.root.cleanup()
+
+    def join(self, ts):
+        self.now = ts
+        self.journal.record(1, USER, None, CHANNEL)
+
+    def leave(self, ts):
+        self.now = ts
+        self.journal.record(1, USER, CHANNEL, None)
+
+    def daily_snapshot(self, ts, in_voice):
+        self.now = ts
+        self.journal.record_present(1, [(USER, CHANNEL.id, True)] if in_voice else [])
+
+    def minutes(self, day):
+        return self.journal.day_stats(1, datetime.date(2024, 10, day))['voice_minutes']
+
+    def test_session_spanning_several_days(self):
+        self.join(at(1, 20))
+        self.daily_snapshot(at(2, 6), True)
+        self.daily_snapshot(at(3, 6), True)
+        self.leave(at(4, 2))
+        self.daily_snapshot(at(4, 6), False)
+        self.journal.flush()
+        self.now = at(5, 12)
+
+        self.assertEqual([self.minutes(day) for day in (1, 2, 3, 4)], [240, 1440, 1440, 120])
+
+    def test_snapshot_does_not_split_a_known_session(self):
+        self.join(at(1, 3))
+        self.daily_snapshot(at(1, 6), True)
+        self.leave(at(1, 7))
+        self.journal.flush()
+        self.now = at(2, 12)
+
+        stats = self.journal.day_stats(1, datetime.date(2024, 10, 1))
+        self.assertEqual((stats['voice_minutes'], stats['sessions']), (240, 1))
+
+    def test_compacted_days_keep_multi_day_sessions(self):
+        self.join(at(1, 20))
+        self.daily_snapshot(at(2, 6), True)
+        self.leave(at(3, 2))
+        self.journal.flush()
+        self.now = at(20, 12)
+        self.journal.compact(1)
+
+        self.assertEqual([self.minutes(day) for day in (1, 2, 3)], [240, 1440, 120])
+
+
+if __name__ == '__main__':
+    unittest.main()
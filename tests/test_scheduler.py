@@ -0,0 +1,200 @@
+# Standard library imports
+import asyncio
+import datetime
+import heapq
+import itertools
+import os
+import sys
+import types
+import unittest
+
+# Third-party library imports
+import pytz
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if 'config' not in sys.modules:
+    config = types.ModuleType('config')
+    config.SERVER_TIMEZONE = 'UTC'
+    sys.modules['config'] = config
+
+# Local imports
+import scheduler
+
+
+class Stop(Exception):
+    pass
+
+
+class FakeTime:
+    """A clock that moves only once every job is asleep, straight to the earliest wake-up.
+
+    Every sleep wakes `overshoot` seconds late, like asyncio.sleep, and the
+    next sleep after jump() also wakes that much later, like a suspend. The
+    run stops once the earliest wake-up is past `end`.
+    """
+
+    def __init__(self, now, end, overshoot=0.5):
+        self.now = now
+        self.end = end
+        self.overshoot = overshoot
+        self._jump = 0
+        self._sleepers = []
+        self._seq = itertools.count()
+
+    def clock(self):
+        return self.now
+
+    def jump(self, seconds):
+        self._jump = seconds
+
+    async def sleep(self, seconds):
+        wake = self.now + seconds + self.overshoot + self._jump
+        self._jump = 0
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._sleepers, (wake, next(self._seq), future))
+        await future
+
+    async def drive(self, tasks):
+        while True:
+            while len(self._sleepers) < sum(not task.done() for task in tasks):
+                await asyncio.sleep(0)
+            if not self._sleepers:
+                return
+            wake, _, future = heapq.heappop(self._sleepers)
+            if wake > self.end:
+                for _, _, sleeper in [(wake, None, future)] + self._sleepers:
+                    sleeper.set_exception(Stop())
+                self._sleepers = []
+                return
+            self.now = wake
+            future.set_result(None)
+
+
+def local(timezone, *args):
+    return pytz.timezone(timezone).localize(datetime.datetime(*args)).timestamp()
+
+
+class SchedulerTest(unittest.IsolatedAsyncioTestCase):
+    def make(self, timezone, start, end, state=None, **time_options):
+        self.time = FakeTime(start, end, **time_options)
+        self.saved = {}
+        self.runs = {}
+
+        async def load_state():
+            return dict(state or {})
+
+        async def save_state(state):
+            self.saved = dict(state)
+
+        return scheduler.Scheduler(timezone, clock=self.time.clock, sleep=self.time.sleep,
+                                   load_state=load_state, save_state=save_state)
+
+    def register(self, task_scheduler, name, at, **options):
+        self.runs[name] = []
+
+        async def job():
+            self.runs[name].append(self.time.now)
+
+        task_scheduler.register(name, at, job, **options)
+
+    async def run_scheduler(self, task_scheduler):
+        task_scheduler.start()
+        tasks = list(task_scheduler._tasks.values())
+        await self.time.drive(tasks)
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+        for result in results:
+            self.assertIsInstance(result, Stop)
+
+    def local_times(self, timezone, name):
+        return [datetime.datetime.fromtimestamp(ts, pytz.timezone(timezone)).replace(tzinfo=None).isoformat(timespec='minutes')
+                for ts in self.runs[name]]
+
+    async def test_daily_job_keeps_local_time_across_dst(self):
+        tz = 'Europe/Berlin'
+        task_scheduler = self.make(tz, local(tz, 2024, 3, 30, 12), local(tz, 2024, 4, 1, 12))
+        self.register(task_scheduler, 'report', datetime.time(6))
+        self.register(task_scheduler, 'skipped_time', datetime.time(2, 30))
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(self.local_times(tz, 'report'), ['2024-03-31T06:00', '2024-04-01T06:00'])
+        # 02:30 does not exist on the day clocks go forward, so it runs an hour later
+        self.assertEqual(self.local_times(tz, 'skipped_time'), ['2024-03-31T03:30', '2024-04-01T02:30'])
+
+    async def test_repeated_time_runs_once_when_clocks_go_back(self):
+        tz = 'Europe/Berlin'
+        task_scheduler = self.make(tz, local(tz, 2024, 10, 26, 12), local(tz, 2024, 10, 27, 12))
+        self.register(task_scheduler, 'night', datetime.time(2, 30))
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(len(self.runs['night']), 1)
+        ran = datetime.datetime.fromtimestamp(self.runs['night'][0], pytz.timezone(tz))
+        self.assertEqual((ran.hour, ran.minute, ran.utcoffset()), (2, 30, datetime.timedelta(hours=1)))
+
+    async def test_job_without_grace_runs_despite_sleep_overshoot(self):
+        task_scheduler = self.make('UTC', local('UTC', 2024, 5, 6, 23, 0), local('UTC', 2024, 5, 8, 0, 0))
+        self.register(task_scheduler, 'restart', datetime.time(4, 1), weekdays=[1], grace=0)
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(self.local_times('UTC', 'restart'), ['2024-05-07T04:01'])
+
+    async def test_catch_up_after_downtime_within_grace(self):
+        start = local('UTC', 2024, 5, 7, 6, 30)
+        yesterday = local('UTC', 2024, 5, 6, 6)
+        task_scheduler = self.make('UTC', start, local('UTC', 2024, 5, 8, 12), state={'caught_up': yesterday, 'skipped': yesterday,
+                                                                                     'always': yesterday})
+        self.register(task_scheduler, 'caught_up', datetime.time(6), grace=3600)
+        self.register(task_scheduler, 'skipped', datetime.time(6), grace=600)
+        self.register(task_scheduler, 'always', datetime.time(6))
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(self.runs['caught_up'][0], start)
+        self.assertEqual(self.local_times('UTC', 'skipped'), ['2024-05-08T06:00'])
+        self.assertEqual(self.runs['always'][0], start)
+        self.assertEqual(len(self.runs['caught_up']), 2)
+
+    async def test_first_start_does_not_run_a_past_occurrence(self):
+        task_scheduler = self.make('UTC', local('UTC', 2024, 5, 7, 6, 30), local('UTC', 2024, 5, 8, 0))
+        self.register(task_scheduler, 'report', datetime.time(6))
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(self.runs['report'], [])
+
+    async def test_jump_rule(self):
+        # A wake-up more than max(grace, MAX_SLEEP) late is a clock jump; anything shorter is overshoot
+        for jump, grace, expected in [
+            (scheduler.MAX_SLEEP - 10, 0, ['2024-05-07T12:04']),
+            (scheduler.MAX_SLEEP + 10, 0, []),
+            (scheduler.MAX_SLEEP + 10, 3600, ['2024-05-07T12:05']),
+            (2 * 3600, None, ['2024-05-07T14:00']),
+        ]:
+            with self.subTest(jump=jump, grace=grace):
+                task_scheduler = self.make('UTC', local('UTC', 2024, 5, 7, 11, 58), local('UTC', 2024, 5, 7, 23), overshoot=0)
+                self.register(task_scheduler, 'job', datetime.time(12), grace=grace)
+                self.time.jump(jump)
+                await self.run_scheduler(task_scheduler)
+
+                self.assertEqual(self.local_times('UTC', 'job'), expected)
+
+    async def test_weekday_filter(self):
+        task_scheduler = self.make('UTC', local('UTC', 2024, 5, 10, 0), local('UTC', 2024, 5, 20, 0))
+        self.register(task_scheduler, 'weekend', datetime.time(9), weekdays=[5, 6])
+        await self.run_scheduler(task_scheduler)
+
+        self.assertEqual(self.local_times('UTC', 'weekend'),
+                         ['2024-05-11T09:00', '2024-05-12T09:00', '2024-05-18T09:00', '2024-05-19T09:00'])
+
+    async def test_state_persists_across_restarts(self):
+        task_scheduler = self.make('UTC', local('UTC', 2024, 5, 7, 5), local('UTC', 2024, 5, 7, 7))
+        self.register(task_scheduler, 'report', datetime.time(6))
+        await self.run_scheduler(task_scheduler)
+        self.assertEqual(self.saved, {'report': local('UTC', 2024, 5, 7, 6)})
+
+        # Restarting after the run does not repeat it
+        restarted = self.make('UTC', local('UTC', 2024, 5, 7, 6, 10), local('UTC', 2024, 5, 7, 12), state=self.saved)
+        self.register(restarted, 'report', datetime.time(6), grace=3600)
+        await self.run_scheduler(restarted)
+        self.assertEqual(self.runs['report'], [])
+
+
+if __name__ == '__main__':
+    unittest.main()
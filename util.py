@@ -1,74 +1,61 @@
 # Standard library imports
+import asyncio
+import copy
+import hashlib
 import os
+import pickle
 import stat
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from dateutil.relativedelta import relativedelta
 
 # Third-party library imports
 import discord
-import matplotlib.pyplot as plt
-import matplotlib.dates as mdates
-import pandas as pd
 import pytz
-import requests
-import yaml
-from matplotlib.ticker import MaxNLocator
-import numpy as np
 
 # Local imports
-from config import DEVELOPER_ID, SERVER_TIMEZONE, GITHUB_TOKEN
+from config import DEVELOPER_ID, SERVER_TIMEZONE
+import dispatcher
+import guild_index
+import plotting
+from io_pool import run_io
+from storage import get_storage
 
 
 def pluralize(count, singular, plural):
     return plural if count > 1 else singular
 
 
-def get_member_by_name(guild, name):
+def get_member_by_name(guild, name, case_insensitive=False):
     """Get a member by name."""
-    for member in guild.members:
-        if member.name == name:
-            return member
-    return None
+    return guild_index.get_index(guild).members.get_by_name(name, case_insensitive)
 
 
 def get_member_by_id(guild, id):
     """Get a member by ID."""
-    for member in guild.members:
-        if member.id == id:
-            return member
-    return None
+    return guild_index.get_index(guild).members.get_by_id(id)
 
 
-def get_channel_by_name(guild, name):
-    """Get a channel by name."""
-    for channel in guild.channels:
-        if channel.name == name:
-            return channel
-    return None
+def get_channel_by_name(guild, name, channel_type=None, case_insensitive=False):
+    """Get a channel by name, optionally only of the given type (e.g. discord.VoiceChannel)."""
+    return guild_index.get_index(guild).channels.get_by_name(name, case_insensitive, channel_type)
 
 
 def get_channel_by_id(guild, id):
     """Get a channel by ID."""
-    for channel in guild.channels:
-        if channel.id == id:
-            return channel
-    return None
+    return guild_index.get_index(guild).channels.get_by_id(id)
 
 
-def get_role_by_name(guild, name):
+def get_role_by_name(guild, name, case_insensitive=False):
     """Get a role by name."""
-    for role in guild.roles:
-        if role.name == name:
-            return role
-    return None
+    return guild_index.get_index(guild).roles.get_by_name(name, case_insensitive)
 
 
 def get_role_by_id(guild, id):
     """Get a role by ID."""
-    for role in guild.roles:
-        if role.id == id:
-            return role
-    return None
+    return guild_index.get_index(guild).roles.get_by_id(id)
 
 
 async def find_user_guild(client, user_id: int):
@@ -76,7 +63,7 @@ async def find_user_guild(client, user_id: int):
     associated_guilds = []
 
     for guild in client.guilds:
-        member = guild.get_member(user_id)
+        member = get_member_by_id(guild, user_id)
         if member:
             associated_guilds.append(guild)
 
@@ -90,14 +77,6 @@ def set_permissions(path):
     os.chmod(path, permission)
 
 
-async def create_game_room(guild, category, name):
-    return await guild.create_voice_channel("Game Room " + name, category=category)
-
-
-def is_game_room_channel(channel, category_name):
-    return channel.name.startswith("Game Room ") and channel.category and channel.category.name == category_name
-
-
 def format_duration(seconds):
     hours, remainder = divmod(seconds, 3600)
     minutes, seconds = divmod(remainder, 60)
@@ -110,60 +89,82 @@ def user_list(channel):
     return ", ".join([member.mention for member in channel.members])
 
 
+# In-memory config cache: guild_id -> (stamp, config). The stamp comes from the
+# storage backend and changes when the config is edited out-of-band. Loads and
+# saves run in I/O pool threads, so the cache is only touched under the lock.
+# SQLite's stamp does not change for writes made by our own connection, so each
+# save also bumps the guild's generation; a load that raced a save sees the
+# bump and does not cache what it read.
+_config_cache = {}
+_config_generations = {}
+_config_lock = threading.Lock()
+config_cache_stats = {'hits': 0, 'misses': 0}
+
+
 def load_config(guild_id):
-    config_path = f'guilds/{guild_id}/config.yml'
     default_config = {'log_channel_name': 'server_logs',
                       'logging_enabled': False}
+    key = str(guild_id)
+    storage = get_storage()
+    stamp = storage.config_stamp(guild_id)
+
+    with _config_lock:
+        cached = _config_cache.get(key)
+        if cached is not None and cached[0] == stamp:
+            config_cache_stats['hits'] += 1
+            return copy.deepcopy(cached[1])
+        config_cache_stats['misses'] += 1
+        generation = _config_generations.get(key, 0)
+
+    config = storage.load_config(guild_id)
+    if config is None:
+        # Persist the default config for the guild
+        save_config(guild_id, default_config)
+        return copy.deepcopy(default_config)
+
+    with _config_lock:
+        if _config_generations.get(key, 0) == generation:
+            _config_cache[key] = (stamp, config)
+    return copy.deepcopy(config)
 
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as file:
-            return yaml.safe_load(file)
-    else:
-        # Create the config directory if it doesn't exist
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
 
-        # Create the config file with default values
-        with open(config_path, 'w') as file:
-            yaml.safe_dump(default_config, file)
+def save_config(guild_id, config):
+    key = str(guild_id)
+    storage = get_storage()
+    # Saves are rare; holding the lock keeps the cache in the same order as the writes
+    with _config_lock:
+        storage.save_config(guild_id, config)
+        _config_generations[key] = _config_generations.get(key, 0) + 1
+        # Write through so the next load is served from memory
+        _config_cache[key] = (storage.config_stamp(guild_id), copy.deepcopy(config))
 
-        return default_config
 
+async def load_config_async(guild_id):
+    return await run_io(load_config, guild_id)
 
-def save_config(guild_id, config):
-    config_path = f'guilds/{guild_id}/config.yml'
 
-    with open(config_path, 'w') as file:
-        yaml.safe_dump(config, file)
+async def save_config_async(guild_id, config):
+    await run_io(save_config, guild_id, config)
+
 
 def store_last_seen(guild_id, user_id):
-    seen_path = f'guilds/{guild_id}/users_seen.yml'
-    seen_data = {}
+    get_storage().set_last_seen(guild_id, user_id, get_current_time())
 
-    if os.path.exists(seen_path):
-        with open(seen_path, 'r') as file:
-            seen_data = yaml.safe_load(file)
-    else:
-        # Create the directory if it doesn't exist
-        os.makedirs(os.path.dirname(seen_path), exist_ok=True)
-        
-    seen_data[user_id] = get_current_time()
 
-    with open(seen_path, 'w') as file:
-        yaml.safe_dump(seen_data, file)
+def load_last_seen(guild_id, user_id):
+    last_seen = get_storage().get_last_seen(guild_id, user_id)
+    if last_seen is None:
+        return "Never"
+    return last_seen
 
+async def store_last_seen_async(guild_id, user_id):
+    await run_io(store_last_seen, guild_id, user_id)
 
-def load_last_seen(guild_id, user_id):
-    seen_path = f'guilds/{guild_id}/users_seen.yml'
-    
-    if os.path.exists(seen_path):
-        with open(seen_path, 'r') as file:
-            seen_data = yaml.safe_load(file)
-            if user_id in seen_data:
-                return seen_data[user_id]
-    
-    return "Never"
 
-async def send_embed(recipient, title, description, color, url=None, fields=None, file=None, thumbnail_url=None):
+async def load_last_seen_async(guild_id, user_id):
+    return await run_io(load_last_seen, guild_id, user_id)
+
+def build_embed(title, description, color, url=None, fields=None, thumbnail_url=None):
     embed = discord.Embed(
         title=title, description=description, color=color, url=url)
     embed.timestamp = discord.utils.utcnow()
@@ -175,78 +176,137 @@ async def send_embed(recipient, title, description, color, url=None, fields=None
         for name, value in fields:
             embed.add_field(name=name, value=value, inline=False)
 
+    return embed
+
+async def send_embed(recipient, title, description, color, url=None, fields=None, file=None, thumbnail_url=None):
+    embed = build_embed(title, description, color, url, fields, thumbnail_url)
+
     if file:
         await recipient.send(embed=embed, file=file)
     else:
         await recipient.send(embed=embed)
 
-def save_daily_voice_minutes(guild_id, minutes):
-    guild_dir = f'guilds/{guild_id}'
-    voice_minutes_file = f'{guild_dir}/voice_minutes.yml'
+def queue_embed(channel, title, description, color, url=None, fields=None, thumbnail_url=None, priority=dispatcher.PRIORITY_LOG):
+    """Queue an embed through the rate-limited outbound dispatcher instead of sending it directly.
 
-    os.makedirs(guild_dir, exist_ok=True)
+    Returns a future that resolves to the sent message; log events can ignore it.
+    """
+    embed = build_embed(title, description, color, url, fields, thumbnail_url)
+    return dispatcher.outbound.enqueue(channel, embed, priority)
 
-    with open(voice_minutes_file, 'w') as file:
-        yaml.safe_dump({'voice_minutes': minutes}, file)
+# Write-behind buffers: the in-memory values are the source of truth and are
+# written to disk in coalesced batches by flush_voice_data_async().
+_voice_activity = {}
+_voice_minutes = {}
+_dirty_voice_activity = set()
+_dirty_voice_minutes = set()
+
+
+def save_daily_voice_minutes(guild_id, minutes):
+    _voice_minutes[int(guild_id)] = minutes
+    _dirty_voice_minutes.add(int(guild_id))
 
 def load_daily_voice_minutes():
-    daily_voice_minutes = {}
-    for guild_id in os.listdir('guilds'):
-        voice_minutes_file = f'guilds/{guild_id}/voice_minutes.yml'
-        if os.path.exists(voice_minutes_file):
-            with open(voice_minutes_file, 'r') as file:
-                daily_voice_minutes[int(guild_id)] = yaml.safe_load(file).get('voice_minutes', 0)
+    daily_voice_minutes = get_storage().load_voice_minutes()
+
+    # Unflushed values are newer than what is stored
+    for guild_id in _dirty_voice_minutes:
+        daily_voice_minutes[guild_id] = _voice_minutes[guild_id]
+    _voice_minutes.update(daily_voice_minutes)
     return daily_voice_minutes
 
-def clear_daily_voice_minutes():
-    for guild_id in os.listdir('guilds'):
-        voice_minutes_file = f'guilds/{guild_id}/voice_minutes.yml'
-        if os.path.exists(voice_minutes_file):
-            with open(voice_minutes_file, 'w') as file:
-                yaml.safe_dump({'voice_minutes': 0}, file)
-
-def manage_voice_activity(guild_id: int, user_id: int = 0, add_user: bool = False):
-    guild_dir = f'guilds/{guild_id}'
-    voice_activity_file = f'{guild_dir}/voice_activity.yml'
-
-    # Create the guild directory if it doesn't exist
-    os.makedirs(guild_dir, exist_ok=True)
-
-    # Load existing voice_activity data from the YAML file, if it exists
-    if os.path.exists(voice_activity_file):
-        with open(voice_activity_file, 'r') as file:
-            voice_activity_data = yaml.safe_load(file)
-            if voice_activity_data is None:
-                voice_activity_data = set()
-            else:
-                voice_activity_data = set(voice_activity_data)
-    else:
-        voice_activity_data = set()
+async def manage_voice_activity_async(guild_id: int, user_id: int = 0, add_user: bool = False):
+    if int(guild_id) not in _voice_activity:
+        await preload_voice_activity_async([guild_id])
+    voice_activity_data = _voice_activity[int(guild_id)]
 
     if add_user and (user_id != 0):
-        # Add the user ID to voice_activity_data
-        voice_activity_data.add(user_id)
-
-        # Save updated voice_activity_data to the YAML file
-        with open(voice_activity_file, 'w') as file:
-            yaml.safe_dump(list(voice_activity_data), file)
+        # Add the user ID to voice_activity_data; it is written on the next flush
+        if user_id not in voice_activity_data:
+            voice_activity_data.add(user_id)
+            _dirty_voice_activity.add(int(guild_id))
     else:
         return list(voice_activity_data)
 
 
-def clear_voice_activity(guild_id: int):
-    guild_dir = f'guilds/{guild_id}'
-    voice_activity_file = f'{guild_dir}/voice_activity.yml'
+def _take_dirty_voice_data():
+    activity = {guild_id: set(_voice_activity[guild_id]) for guild_id in _dirty_voice_activity}
+    minutes = {guild_id: _voice_minutes[guild_id] for guild_id in _dirty_voice_minutes}
+    _dirty_voice_activity.clear()
+    _dirty_voice_minutes.clear()
+    return activity, minutes
+
+
+def _write_voice_data(activity, minutes):
+    storage = get_storage()
+    for guild_id, user_ids in activity.items():
+        storage.save_voice_activity(guild_id, user_ids)
+    for guild_id, guild_minutes in minutes.items():
+        storage.save_voice_minutes(guild_id, guild_minutes)
+    return len(activity) + len(minutes)
+
+
+async def flush_voice_data_async():
+    # Snapshot on the event loop so the worker thread never sees a set being modified
+    activity, minutes = _take_dirty_voice_data()
+    if not activity and not minutes:
+        return 0
+    try:
+        return await run_io(_write_voice_data, activity, minutes)
+    except Exception:
+        # Keep the data buffered so the next flush retries it
+        _dirty_voice_activity.update(activity)
+        _dirty_voice_minutes.update(minutes)
+        raise
+
 
-    # Create the guild directory if it doesn't exist
-    os.makedirs(guild_dir, exist_ok=True)
+def _load_voice_activity(guild_ids):
+    """Read the stored voice activity of each guild. Runs in the I/O pool; the buffer is left to the event loop."""
+    storage = get_storage()
+    return {guild_id: storage.load_voice_activity(guild_id) for guild_id in guild_ids}
 
-    # Clear the voice_activity data
-    voice_activity_data = set()
 
-    # Save the cleared voice_activity_data to the YAML file
-    with open(voice_activity_file, 'w') as file:
-        yaml.safe_dump(list(voice_activity_data), file)
+async def preload_voice_activity_async(guild_ids):
+    """Load the stored voice activity of guilds that are not buffered yet."""
+    missing = [int(guild_id) for guild_id in guild_ids if int(guild_id) not in _voice_activity]
+    if not missing:
+        return
+    loaded = await run_io(_load_voice_activity, missing)
+    for guild_id, user_ids in loaded.items():
+        # A guild buffered on the loop while the worker read it already holds newer data
+        _voice_activity.setdefault(guild_id, user_ids)
+
+
+async def clear_voice_activity_async(guild_id: int):
+    _voice_activity[int(guild_id)] = set()
+    _dirty_voice_activity.discard(int(guild_id))
+    await run_io(get_storage().save_voice_activity, guild_id, [])
+
+
+async def clear_daily_voice_minutes_async():
+    _voice_minutes.clear()
+    _dirty_voice_minutes.clear()
+    await run_io(get_storage().clear_voice_minutes)
+
+
+async def load_daily_voice_minutes_async():
+    return await run_io(load_daily_voice_minutes)
+
+
+async def load_voice_sessions_async():
+    return await run_io(get_storage().load_voice_sessions)
+
+
+async def save_voice_sessions_async(checkpoint):
+    await run_io(get_storage().save_voice_sessions, checkpoint)
+
+
+async def load_schedule_async():
+    return await run_io(get_storage().load_schedule)
+
+
+async def save_schedule_async(last_runs):
+    await run_io(get_storage().save_schedule, last_runs)
 
 
 async def send_developer_message(client, title, description, color, file=None, fields=None):
@@ -267,111 +327,66 @@ async def send_developer_message(client, title, description, color, file=None, f
         await send_embed(developer, title, description, color, None, fields)
 
 def save_daily_report(guild_id: int, current_time: datetime, unique_users: int, total_voice_minutes: int):
-    daily_report_file = f'guilds/{guild_id}/daily_report_data.csv'
-
     print(f'Saving report data... {current_time}, {unique_users}, {total_voice_minutes}')
+    get_storage().append_daily_report(guild_id, current_time, unique_users, total_voice_minutes)
 
-    # Create the guild directory if it doesn't exist
-    guild_dir = os.path.dirname(daily_report_file)
-    os.makedirs(guild_dir, exist_ok=True)
+async def save_daily_report_async(guild_id: int, current_time: datetime, unique_users: int, total_voice_minutes: int):
+    await run_io(save_daily_report, guild_id, current_time, unique_users, total_voice_minutes)
 
-    report_data = f'{current_time},{unique_users},{total_voice_minutes}\n'
-    with open(daily_report_file, 'a') as file:
-        file.write(report_data)
+def collect_plot_data(guilds: list):
+    """Read the daily report history of each guild as plain, picklable data."""
+    import numpy as np
 
-def generate_plot(guilds: list):
-    print(f'Generating plot...')
-    plot_image_file = f'daily_report_plot.png'
-
-    plt.figure()
-
-    # Loop through each guild and plot the data
-    for guild in guilds:
-        guild_id = guild.id
-        guild_name = guild.name
-        daily_report_file = f'guilds/{guild_id}/daily_report_data.csv'
-
-        # Read the daily report data and create a DataFrame
-        with open(daily_report_file, 'r') as file:
-            first_line = file.readline().strip()
-            columns = first_line.split(',')
-            if len(columns) == 2:
-                data = pd.read_csv(daily_report_file, names=['date', 'unique_users'], parse_dates=['date'])
-                data['total_voice_hours'] = 0  # Add a default column for total_voice_hours
-            else:
-                data = pd.read_csv(daily_report_file, names=['date', 'unique_users', 'total_voice_minutes'], parse_dates=['date'])
-                data['total_voice_hours'] = data['total_voice_minutes'] / 60.0
-
-        max_value = data['unique_users'].max()
-        max_value_date = data['date'][data['unique_users'].idxmax()].strftime('%Y-%m-%d')
-
-        # Use only the bottom x rows of the data
-        data = data.tail(30)
-
-        mean_value = data['unique_users'].mean()
-        median_value = data['unique_users'].median()
-        std_dev = data['unique_users'].std()
-
-        fig, ax1 = plt.subplots()
+    storage = get_storage()
+    # np.array copies the memory-mapped window so it can be pickled to the worker
+    return [(guild.name, np.array(storage.load_daily_series(guild.id, limit=plotting.PLOT_DAYS)),
+             storage.load_daily_report_summary(guild.id)) for guild in guilds]
 
-        color = 'tab:blue'
-        ax1.set_xlabel('Date')
-        ax1.set_ylabel('Unique Users', color=color)
-        ax1.bar(data['date'], data['unique_users'], color=color, alpha=0.6, label=f'{guild_name} - Unique Users')
-        ax1.tick_params(axis='y', labelcolor=color)
 
-        ax2 = ax1.twinx()  # Instantiate a second axes that shares the same x-axis
-        color = 'tab:red'
-        ax2.set_ylabel('Total Voice Hours', color=color)
-        ax2.plot(data['date'], data['total_voice_hours'].round(2), label=f'{guild_name} - Total Voice Hours', color=color, linestyle='--')
-        ax2.tick_params(axis='y', labelcolor=color)
+# Rendered PNGs keyed by a hash of the plotted data
+_plot_cache = OrderedDict()
+_plot_cache_size = 8
+_plot_pool = None
 
-        # Compute the coefficients of the linear trendline for unique users
-        x = np.arange(len(data))
-        coeffs = np.polyfit(x, data['unique_users'], 1)
-        trendline = coeffs[0] * x + coeffs[1]
-        trendline_plot, = ax1.plot(data['date'], trendline, label=f'Trend ({coeffs[0]:.2f}x + {coeffs[1]:.2f})', color='tab:blue', linestyle='--')
 
-        # Fill the area between the trendline and the unique_users plot
-        ax1.fill_between(data['date'], data['unique_users'], trendline, where=(data['unique_users'] > trendline), interpolate=True, alpha=0.3, color='tab:blue', edgecolor='none')
+def _get_plot_pool():
+    global _plot_pool
+    if _plot_pool is None:
+        _plot_pool = ProcessPoolExecutor(max_workers=1)
+    return _plot_pool
 
-        # Label the final data point for unique users
-        final_date = data['date'].iloc[-1]
-        final_value = data['unique_users'].iloc[-1]
-        ax1.text(final_date, final_value, f'{final_value}', color='tab:blue')
 
-        # Label the final data point for total voice hours
-        final_voice_hours_value = data['total_voice_hours'].round(1).iloc[-1]
-        ax2.text(final_date, final_voice_hours_value, f'{final_voice_hours_value}', color='tab:red')
+async def generate_plot_async(guilds: list):
+    """Render the daily report plot in a worker process and return PNG bytes.
 
-        # Display statistical information along the bottom of the graph
-        stats_text = (
-            f'Mean: {mean_value:.2f}\n'
-            f'Median: {median_value}\n'
-            f'Std Deviation: {std_dev:.2f}\n'
-            f'Max: {max_value} on {max_value_date}'
-        )
-        plt.figtext(0.1225, 0.25, stats_text, horizontalalignment='left', verticalalignment='bottom')
+    Identical input data is only rendered once; later calls reuse the cached
+    PNG.
+    """
+    plot_data = await run_io(collect_plot_data, guilds)
+    key = hashlib.sha256(pickle.dumps(plot_data)).hexdigest()
 
-        # Format the x-axis to show dates properly
-        ax1.xaxis.set_major_formatter(mdates.DateFormatter('%Y-%m-%d'))
-        ax1.xaxis.set_major_locator(mdates.DayLocator(interval=5))
-        plt.setp(ax1.xaxis.get_majorticklabels(), rotation=45)
+    if key in _plot_cache:
+        _plot_cache.move_to_end(key)
+        return _plot_cache[key]
 
-        ax1.yaxis.set_major_locator(MaxNLocator(integer=True))
-
-        # Add a legend
-        fig.legend(handles=[trendline_plot], loc='upper left')
-        fig.tight_layout()  # Otherwise the right y-label is slightly clipped
-        fig.subplots_adjust(top=0.93)  # Adjust the top padding to ensure the title is not cut off
+    print(f'Generating plot...')
+    loop = asyncio.get_running_loop()
+    png = await loop.run_in_executor(_get_plot_pool(), plotting.render_daily_plot, plot_data)
 
-    plt.title(f'Daily Voice Channel Usage')
+    _plot_cache[key] = png
+    while len(_plot_cache) > _plot_cache_size:
+        _plot_cache.popitem(last=False)
+    return png
 
-    # Save the plot as an image
-    plt.savefig(plot_image_file)
 
-    return plot_image_file
+async def generate_heatmap_async(guild, days: int):
+    """Render the guild's hour-of-week voice heatmap over the last `days` days and return PNG bytes."""
+    import rollups
 
+    grid = await run_io(rollups.rollup_engine.heatmap, guild.id, days)
+    print(f'Generating heatmap for {guild.name}...')
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_plot_pool(), plotting.render_heatmap, guild.name, grid, days)
 
 
 def get_current_time(show_time=True, no_format=False):
@@ -415,29 +430,10 @@ def compute_time_difference(time_str):
     return f'{time_diff_str} ago'
 
 
-def populate_userlist(bot):
+async def populate_userlist_async(bot):
     for guild in bot.guilds:
         for channel in guild.channels:
             if isinstance(channel, discord.VoiceChannel):
                 for member in channel.members:
-                    manage_voice_activity(
+                    await manage_voice_activity_async(
                         guild.id, member.id, add_user=True)
-
-
-def get_latest_commit_sha():
-    url = f"https://api.github.com/repos/derekShaheen/TLEDiscordBot/commits"
-    headers = {
-        "Authorization": f"token {GITHUB_TOKEN}",
-    }
-    response = requests.get(url, headers=headers)
-
-    if response.status_code == 200:
-        commits = response.json()
-        latest_commit = commits[0]
-        full_sha = latest_commit["sha"]
-        short_sha = full_sha[:7]
-
-        return short_sha
-    else:
-        print(f"Error checking version: {response.status_code}")
-        return None
\ No newline at end of file
@@ -0,0 +1,104 @@
+# Standard library imports
+import asyncio
+import time
+
+# Third-party library imports
+import aiohttp
+
+# Local imports
+import config
+
+DEFAULT_COMMITS_URL = 'https://api.github.com/repos/derekShaheen/TLEDiscordBot/commits'
+
+
+class VersionChecker:
+    """Polls the GitHub commits API for the latest commit SHA without blocking.
+
+    Requests are conditional on the last ETag, so an unchanged repository costs
+    a 304 that GitHub does not count against the rate limit. Failures and rate
+    limits back off exponentially; while backing off the last known SHA is
+    returned without making a request.
+    """
+
+    def __init__(self, url=None, token=None, timeout=10.0, base_backoff=30.0, max_backoff=1800.0,
+                 clock=time.monotonic):
+        self.url = url or getattr(config, 'GITHUB_COMMITS_URL', DEFAULT_COMMITS_URL)
+        self.token = token if token is not None else getattr(config, 'GITHUB_TOKEN', None)
+        self.timeout = timeout
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self._clock = clock
+        self._session = None
+        self._etag = None
+        self._sha = None
+        self._failures = 0
+        self._next_attempt = 0.0
+
+    async def get_latest_sha(self):
+        """Return the latest short SHA, or the last known one (None if never fetched)."""
+        if self._clock() < self._next_attempt:
+            return self._sha
+
+        headers = {'Accept': 'application/vnd.github+json'}
+        if self.token:
+            headers['Authorization'] = f'token {self.token}'
+        if self._etag:
+            headers['If-None-Match'] = self._etag
+
+        try:
+            session = self._get_session()
+            async with session.get(self.url, headers=headers, params={'per_page': '1'}) as response:
+                if response.status == 304:
+                    self._succeeded()
+                elif response.status == 200:
+                    commits = await response.json()
+                    self._sha = commits[0]['sha'][:7]
+                    self._etag = response.headers.get('ETag')
+                    self._succeeded()
+                elif response.status in (403, 429):
+                    self._failed(f'rate limited ({response.status})', _retry_after(response.headers))
+                else:
+                    self._failed(f'HTTP {response.status}')
+        except asyncio.TimeoutError:
+            self._failed(f'timed out after {self.timeout}s')
+        except (aiohttp.ClientError, ValueError, KeyError, IndexError) as exc:
+            self._failed(str(exc) or type(exc).__name__)
+
+        return self._sha
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self):
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.timeout))
+        return self._session
+
+    def _succeeded(self):
+        self._failures = 0
+        self._next_attempt = 0.0
+
+    def _failed(self, reason, retry_after=None):
+        self._failures += 1
+        delay = min(self.base_backoff * 2 ** (self._failures - 1), self.max_backoff)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        self._next_attempt = self._clock() + delay
+        print(f"Error checking version: {reason}, retrying in {delay:.0f}s")
+
+
+def _retry_after(headers):
+    """Seconds to wait according to GitHub's rate limit headers, if present."""
+    if 'Retry-After' in headers:
+        try:
+            return float(headers['Retry-After'])
+        except ValueError:
+            return None
+    if headers.get('X-RateLimit-Remaining') == '0' and 'X-RateLimit-Reset' in headers:
+        try:
+            return max(float(headers['X-RateLimit-Reset']) - time.time(), 0.0)
+        except ValueError:
+            return None
+    return None
@@ -0,0 +1,129 @@
+# Standard library imports
+import time
+
+AFK_CHANNEL_NAME = 'Away from Keyboard'
+
+
+class VoiceSession:
+    """One member's current stay in a voice channel of one guild."""
+
+    __slots__ = ('guild_id', 'user_id', 'channel_id', 'started_at', 'counted')
+
+    def __init__(self, guild_id, user_id, channel_id, started_at, counted):
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.channel_id = channel_id
+        self.started_at = started_at
+        self.counted = counted  # Whether the time counts towards voice minutes
+
+
+class SessionEngine:
+    """Tracks open voice sessions per (guild, user) and accumulates voice time.
+
+    Time is accumulated in seconds and only converted to whole minutes when
+    read, so switching channels never truncates a partial minute. Timestamps
+    are epoch seconds so sessions survive a restart through checkpoint() and
+    restore().
+    """
+
+    def __init__(self, clock=time.time):
+        self._clock = clock
+        self._sessions = {}
+        self._voice_seconds = {}
+
+    def join(self, guild_id, user_id, channel_id, counted=True):
+        self._sessions[(guild_id, user_id)] = VoiceSession(guild_id, user_id, channel_id, self._clock(), counted)
+
+    def leave(self, guild_id, user_id):
+        """Close the session and return its duration in seconds, or None if it was unknown."""
+        session = self._sessions.pop((guild_id, user_id), None)
+        if session is None:
+            return None
+        return self._close(session, self._clock())
+
+    def switch(self, guild_id, user_id, channel_id, counted=True):
+        """Close the current segment, open one in the new channel, and return the closed duration."""
+        duration = self.leave(guild_id, user_id)
+        self.join(guild_id, user_id, channel_id, counted)
+        return duration
+
+    def voice_seconds(self, guild_id):
+        return self._voice_seconds.get(guild_id, 0.0)
+
+    def voice_minutes(self, guild_id):
+        return int(self.voice_seconds(guild_id) // 60)
+
+    def guild_ids(self):
+        return set(self._voice_seconds) | {guild_id for guild_id, _ in self._sessions}
+
+    def set_voice_seconds(self, guild_id, seconds):
+        self._voice_seconds[guild_id] = float(seconds)
+
+    def roll_day(self):
+        """Charge open sessions up to now, reset the daily totals, and return the old totals."""
+        now = self._clock()
+        for session in self._sessions.values():
+            self._close(session, now)
+            session.started_at = now
+        totals = self._voice_seconds
+        self._voice_seconds = {}
+        return totals
+
+    def checkpoint(self):
+        """Return a plain-data snapshot suitable for storage."""
+        return {
+            'saved_at': self._clock(),
+            'sessions': [[session.guild_id, session.user_id, session.channel_id, session.started_at, session.counted]
+                         for session in self._sessions.values()],
+            'voice_seconds': dict(self._voice_seconds),
+        }
+
+    def restore(self, checkpoint, live_states):
+        """Rebuild sessions after a restart.
+
+        live_states is an iterable of (guild_id, user_id, channel_id, counted)
+        for everyone currently in voice. Sessions still open in the same
+        channel keep their original start. Sessions that ended while the bot
+        was down are charged only up to the checkpoint, so downtime is never
+        counted for members who had already left.
+        """
+        now = self._clock()
+        saved = {}
+        if checkpoint:
+            saved_at = min(checkpoint.get('saved_at', now), now)
+            for guild_id, seconds in (checkpoint.get('voice_seconds') or {}).items():
+                self._voice_seconds[int(guild_id)] = max(self._voice_seconds.get(int(guild_id), 0.0), float(seconds))
+            for guild_id, user_id, channel_id, started_at, counted in checkpoint.get('sessions') or []:
+                saved[(guild_id, user_id)] = VoiceSession(guild_id, user_id, channel_id, min(started_at, saved_at), counted)
+
+        self._sessions = {}
+        for guild_id, user_id, channel_id, counted in live_states:
+            session = saved.pop((guild_id, user_id), None)
+            if session is not None and session.channel_id == channel_id:
+                self._sessions[(guild_id, user_id)] = session
+                continue
+            if session is not None:
+                self._close(session, saved_at)
+            self._sessions[(guild_id, user_id)] = VoiceSession(guild_id, user_id, channel_id, now, counted)
+
+        for session in saved.values():
+            self._close(session, saved_at)
+
+    def _close(self, session, ended_at):
+        duration = max(ended_at - session.started_at, 0.0)
+        if session.counted:
+            self._voice_seconds[session.guild_id] = self._voice_seconds.get(session.guild_id, 0.0) + duration
+        return duration
+
+
+def is_counted(channel):
+    """Whether time spent in the channel counts towards voice minutes."""
+    return channel.name != AFK_CHANNEL_NAME
+
+
+def live_voice_states(guilds):
+    """Yield (guild_id, user_id, channel_id, counted) for every member currently in voice."""
+    for guild in guilds:
+        for channel in guild.voice_channels:
+            for member in channel.members:
+                yield guild.id, member.id, channel.id, is_counted(channel)